@@ -0,0 +1,18 @@
+import os
+
+import httpx
+
+# Separate budgets per phase: connecting to Render should fail fast, while a
+# streamed reply may legitimately pause between chunks while the LLM thinks
+BACKEND_TIMEOUT = httpx.Timeout(
+    connect=float(os.getenv("BACKEND_CONNECT_TIMEOUT", 5)),
+    read=float(os.getenv("BACKEND_READ_TIMEOUT", 60)),
+    write=10.0,
+    pool=5.0,
+)
+BACKEND_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=120)
+
+
+def create_backend_client():
+    """HTTP/2 client with a keepalive pool, shared by every chat for the bot's lifetime"""
+    return httpx.AsyncClient(http2=True, timeout=BACKEND_TIMEOUT, limits=BACKEND_LIMITS)
@@ -0,0 +1,223 @@
+import asyncio
+import csv
+import hashlib
+import os
+import pickle
+import sys
+
+import intent_classifier
+import query_normalizer
+import service_catalog
+from intent_classifier import IntentClassifier
+from query_normalizer import SYNONYMS, QueryNormalizer
+from service_catalog import ServiceCatalog
+
+# Columns every catalog file must have
+CSV_FIELDS = (
+    "service_name", "description", "department", "processing_time", "required_documents", "fees",
+    "contact_info", "relevant_links", "category", "how_to_apply", "official_portal",
+)
+# Columns that are kept when a catalog file has them
+OPTIONAL_FIELDS = ("aliases",)
+# Bump to force a rebuild for a reason the hashed sources below don't show (e.g. a library upgrade)
+SNAPSHOT_FORMAT = 3
+# Modules whose code builds the pickled objects; a change to any of them invalidates the snapshot
+SNAPSHOT_MODULES = (service_catalog, intent_classifier, query_normalizer, sys.modules[__name__])
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOG_PATH = os.getenv("CATALOG_PATH") or next(
+    (path for path in (os.path.join(os.path.dirname(_BACKEND_DIR), "gov_services.csv"),
+                       os.path.join(_BACKEND_DIR, "gov_services.csv")) if os.path.exists(path)),
+    os.path.join(os.path.dirname(_BACKEND_DIR), "gov_services.csv"),
+)
+# A relative CATALOG_SNAPSHOT is taken from backend/, like the default, not from the working directory
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", ".catalog_snapshot.pkl")
+if CATALOG_SNAPSHOT:
+    CATALOG_SNAPSHOT = os.path.join(_BACKEND_DIR, CATALOG_SNAPSHOT)
+
+
+class CatalogError(ValueError):
+    pass
+
+
+class Catalog:
+    """One version of the service data with every structure derived from it"""
+
+    def __init__(self, rows, version, services, intents, normalizer):
+        self.rows = rows
+        self.version = version
+        self.services = services
+        self.intents = intents
+        self.normalizer = normalizer
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def validate_rows(rows, fieldnames):
+    """Check the header and clean the rows; rows without a service name are skipped"""
+    missing = [field for field in CSV_FIELDS if field not in (fieldnames or ())]
+    if missing:
+        raise CatalogError(f"Catalog is missing columns: {', '.join(missing)}")
+    fields = CSV_FIELDS + tuple(field for field in OPTIONAL_FIELDS if field in fieldnames)
+    valid = []
+    seen = set()
+    for line, row in enumerate(rows, start=2):
+        row = {field: (row.get(field) or "").strip() for field in fields}
+        if not row["service_name"]:
+            print(f"Skipping catalog line {line}: no service_name")
+            continue
+        if row["service_name"].lower() in seen:
+            print(f"Catalog line {line} repeats service '{row['service_name']}'")
+        seen.add(row["service_name"].lower())
+        valid.append(row)
+    if not valid:
+        raise CatalogError("Catalog has no valid rows")
+    return valid
+
+
+def build_catalog(rows, version, greetings, gov_keywords):
+    # Service names only get the synonyms ("DL Extract" is searched as "driving license extract");
+    # the CSV aliases point at the names themselves
+    return Catalog(rows, version, ServiceCatalog(rows, normalize=QueryNormalizer().normalize),
+                   IntentClassifier(greetings, gov_keywords, rows), QueryNormalizer(rows))
+
+
+def _code_digest():
+    digest = hashlib.sha256()
+    for module in SNAPSHOT_MODULES:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
+def load_catalog(greetings, gov_keywords, csv_path=CATALOG_PATH, snapshot_path=CATALOG_SNAPSHOT):
+    """Load the catalog, from the precompiled snapshot when it matches the CSV.
+
+    The version hashes the CSV bytes, the keyword lists and synonyms the
+    matchers are built from, the source of SNAPSHOT_MODULES and
+    SNAPSHOT_FORMAT, so any change to those rebuilds the snapshot instead
+    of loading indexes and regexes built by older code. Raises
+    CatalogError when the CSV is unusable.
+    """
+    try:
+        with open(csv_path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        raise CatalogError(f"Cannot read catalog {csv_path}: {e}")
+    digest = hashlib.sha256(data)
+    digest.update(repr((SNAPSHOT_FORMAT, list(greetings), list(gov_keywords), SYNONYMS)).encode("utf-8"))
+    digest.update(_code_digest())
+    version = digest.hexdigest()[:16]
+
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            with open(snapshot_path, "rb") as f:
+                catalog = pickle.load(f)
+            if isinstance(catalog, Catalog) and catalog.version == version:
+                return catalog
+        except Exception as e:
+            print(f"Ignoring unreadable catalog snapshot: {e}")
+
+    reader = csv.DictReader(data.decode("utf-8-sig").splitlines())
+    catalog = build_catalog(validate_rows(reader, reader.fieldnames), version, greetings, gov_keywords)
+    if snapshot_path:
+        try:
+            # Write to a temporary file first so a crash never leaves half a snapshot
+            tmp_path = f"{snapshot_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, snapshot_path)
+        except OSError as e:
+            print(f"Could not write catalog snapshot: {e}")
+    return catalog
+
+
+class CatalogHolder:
+    """Serves the current catalog and swaps in a new one without a restart.
+
+    Requests read `holder.current` once and keep using that object, so a
+    reload never changes the data under a request that is already running.
+    A new version is loaded in a worker thread and published with a single
+    assignment; `on_swap` callbacks then refresh anything derived from it.
+    """
+
+    def __init__(self, greetings, gov_keywords, csv_path=CATALOG_PATH, snapshot_path=CATALOG_SNAPSHOT):
+        self.greetings = greetings
+        self.gov_keywords = gov_keywords
+        self.csv_path = csv_path
+        self.snapshot_path = snapshot_path
+        self.current = None
+        self.on_swap = []
+        self.lock = asyncio.Lock()
+        self.watcher = None
+        self.mtime = None
+        self.reloads = 0
+        self.last_error = None
+
+    def load(self):
+        """Load synchronously at import time; an unusable CSV leaves an empty catalog"""
+        self.mtime = self._mtime()
+        try:
+            self.current = load_catalog(self.greetings, self.gov_keywords, self.csv_path, self.snapshot_path)
+        except CatalogError as e:
+            self.last_error = str(e)
+            print(f"Error loading catalog: {e}")
+            self.current = build_catalog([], None, self.greetings, self.gov_keywords)
+        return self.current
+
+    def _mtime(self):
+        try:
+            return os.stat(self.csv_path).st_mtime_ns
+        except OSError:
+            return None
+
+    async def reload(self):
+        """Load the CSV again and swap it in; returns (changed, error message or None)"""
+        async with self.lock:
+            self.mtime = self._mtime()
+            try:
+                catalog = await asyncio.to_thread(
+                    load_catalog, self.greetings, self.gov_keywords, self.csv_path, self.snapshot_path)
+            except CatalogError as e:
+                # Keep serving the old catalog
+                self.last_error = str(e)
+                print(f"Catalog reload failed: {e}")
+                return False, str(e)
+            self.last_error = None
+            if self.current is not None and catalog.version == self.current.version:
+                return False, None
+            self.current = catalog
+            self.reloads += 1
+            print(f"Catalog {catalog.version} loaded with {len(catalog)} services")
+            for callback in self.on_swap:
+                try:
+                    await callback(catalog)
+                except Exception as e:
+                    print(f"Error refreshing after catalog reload: {e}")
+            return True, None
+
+    def watch(self, interval):
+        """Reload whenever the CSV's modification time changes, checking every `interval` seconds"""
+        self.watcher = asyncio.create_task(self._watch(interval))
+
+    async def _watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            if self._mtime() != self.mtime:
+                await self.reload()
+
+    async def stop(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+            await asyncio.gather(self.watcher, return_exceptions=True)
+            self.watcher = None
+
+    def stats(self):
+        return {
+            "version": self.current.version if self.current else None,
+            "services": len(self.current) if self.current else 0,
+            "reloads": self.reloads,
+            "watching": self.watcher is not None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,104 @@
+import os
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+
+# MongoDB setup
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "kerala_services")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+# Fail fast instead of hanging a request for pymongo's default 30 s
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 10000))
+
+# Fields returned to clients that track a complaint
+COMPLAINT_PROJECTION = {"name": 1, "contact": 1, "service": 1, "complaint_text": 1, "created_at": 1, "email_status": 1}
+MAX_PAGE_SIZE = 50
+
+client = None
+db = None
+
+
+def connect(mongo_client=None):
+    """Create the shared async client; call from the app's startup hook.
+
+    Pass `mongo_client` to use another client, e.g.
+    `mongomock_motor.AsyncMongoMockClient()` for offline tests.
+    """
+    global client, db
+    if mongo_client is None:
+        mongo_client = AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        )
+    client = mongo_client
+    db = client[MONGO_DB_NAME]
+    return db
+
+
+def close():
+    """Close the shared client; call from the app's shutdown hook"""
+    global client, db
+    if client is not None:
+        client.close()
+    client = None
+    db = None
+
+
+def get_collection(name):
+    if db is None:
+        raise RuntimeError("Database is not connected; call database.connect() first")
+    return db[name]
+
+
+async def ping():
+    """Return True when MongoDB answers a ping"""
+    if db is None:
+        return False
+    try:
+        await db.command("ping")
+        return True
+    except Exception as e:
+        print(f"MongoDB ping failed: {e}")
+        return False
+
+
+async def insert_complaint(complaint_doc):
+    """Store a complaint and return its id as a string"""
+    result = await get_collection("complaints").insert_one(complaint_doc)
+    return str(result.inserted_id)
+
+
+async def ensure_indexes():
+    """Create the indexes the complaint lookups rely on; safe to run on every startup"""
+    complaints = get_collection("complaints")
+    await complaints.create_index([("contact", ASCENDING), ("created_at", DESCENDING)])
+    await complaints.create_index([("created_at", DESCENDING)])
+    await complaints.create_index([("service", ASCENDING), ("created_at", DESCENDING)])
+
+
+async def find_complaint(query):
+    """Return the newest complaint matching the query, with only the client-facing fields"""
+    cursor = get_collection("complaints").find(query, COMPLAINT_PROJECTION).sort("created_at", DESCENDING).limit(1)
+    complaints = await cursor.to_list(length=1)
+    return complaints[0] if complaints else None
+
+
+async def find_complaints_by_contact(contact, page=1, page_size=10):
+    """Return one page of a contact's complaints, newest first, and whether more pages exist"""
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+    cursor = (
+        get_collection("complaints")
+        .find({"contact": contact}, COMPLAINT_PROJECTION)
+        .sort("created_at", DESCENDING)
+        .skip((page - 1) * page_size)
+        .limit(page_size + 1)
+    )
+    complaints = await cursor.to_list(length=page_size + 1)
+    return complaints[:page_size], len(complaints) > page_size
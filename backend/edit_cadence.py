@@ -0,0 +1,51 @@
+import os
+import time
+
+MIN_CHARS = int(os.getenv("TELEGRAM_EDIT_MIN_CHARS", 200))
+MIN_INTERVAL = float(os.getenv("TELEGRAM_EDIT_MIN_INTERVAL", 1.0))
+MAX_STALENESS = float(os.getenv("TELEGRAM_EDIT_MAX_STALENESS", 2.5))
+# Above this many active replies every threshold is stretched proportionally
+BUSY_GENERATIONS = int(os.getenv("TELEGRAM_EDIT_BUSY_GENERATIONS", 20))
+MAX_BACKOFF = 8.0
+
+
+class EditCadence:
+    """Decides when a streaming reply is worth another message edit.
+
+    An edit is due once at least `min_chars` new characters arrived, or once
+    some new text has waited `max_staleness` seconds, but never sooner than
+    `min_interval` after the previous edit. `active_generations` returns how
+    many replies are streaming right now; past `busy_generations` every
+    threshold grows with it, so a busy bot edits each message less often
+    instead of queueing up behind Telegram's rate limits.
+    """
+
+    def __init__(self, active_generations=lambda: 1, min_chars=MIN_CHARS, min_interval=MIN_INTERVAL,
+                 max_staleness=MAX_STALENESS, busy_generations=BUSY_GENERATIONS):
+        self.active_generations = active_generations
+        self.min_chars = min_chars
+        self.min_interval = min_interval
+        self.max_staleness = max_staleness
+        self.busy_generations = busy_generations
+        self.last_edit = time.monotonic()
+        self.edits = 0
+
+    def backoff(self):
+        """How much the thresholds are stretched under the current load"""
+        return min(MAX_BACKOFF, max(1.0, self.active_generations() / self.busy_generations))
+
+    def due(self, pending_chars, now=None):
+        """True when `pending_chars` new characters justify an edit now"""
+        if pending_chars <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        factor = self.backoff()
+        waited = now - self.last_edit
+        if waited < self.min_interval * factor:
+            return False
+        return pending_chars >= self.min_chars * factor or waited >= self.max_staleness * factor
+
+    def edited(self, now=None):
+        self.last_edit = time.monotonic() if now is None else now
+        self.edits += 1
+
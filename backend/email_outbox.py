@@ -0,0 +1,244 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from sendgrid import SendGridAPIClient
+from sendgrid.helpers.mail import Mail, Email, To, Content
+
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+# Seconds before the first retry; doubles on every further attempt
+RETRY_BASE_DELAY = float(os.getenv("EMAIL_RETRY_BASE_DELAY", 5))
+WORKER_COUNT = int(os.getenv("EMAIL_WORKERS", 2))
+# A message claimed for sending longer ago than this is assumed lost with its worker and sent again
+CLAIM_TIMEOUT = float(os.getenv("EMAIL_CLAIM_TIMEOUT", 300))
+# Longest wait between attempts to start the outbox while MongoDB is unreachable
+START_MAX_DELAY = 60.0
+
+
+def _utc(value):
+    """MongoDB returns naive UTC datetimes unless the client is tz_aware"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class SendGridTransport:
+    """Sends outbox messages through one reused SendGrid client"""
+
+    def __init__(self, api_key, sender_email):
+        self.client = SendGridAPIClient(api_key)
+        self.sender_email = sender_email
+
+    async def send(self, message):
+        mail = Mail(Email(self.sender_email), To(message["to"]), message["subject"],
+                    Content("text/plain", message["body"]))
+        if message.get("reply_to"):
+            mail.reply_to = Email(message["reply_to"])
+        # The SendGrid client is synchronous, keep it off the event loop
+        response = await asyncio.to_thread(self.client.send, mail)
+        if response.status_code >= 300:
+            raise RuntimeError(f"SendGrid returned status {response.status_code}: {response.body}")
+        return response.status_code
+
+
+class FakeTransport:
+    """Records messages instead of sending them; fails the first `fail_times` sends"""
+
+    def __init__(self, fail_times=0):
+        self.sent = []
+        self.fail_times = fail_times
+
+    async def send(self, message):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("Fake transport failure")
+        self.sent.append(message)
+        return 202
+
+
+class EmailOutbox:
+    """Persistent outbox for complaint emails, delivered by background workers.
+
+    Every message is stored in MongoDB before the request returns. Its `_id`
+    is `<complaint_id>:<kind>`, so a complaint never queues the same email
+    twice. Workers claim a message atomically, send it and retry failures
+    with exponential backoff. The result is mirrored on the complaint as
+    `email_status.<kind>`.
+
+    A claim records `claimed_at`. Claims older than `claim_timeout`, left
+    behind by a process that stopped mid-send, are checked for every
+    `claim_timeout` seconds and sent again. Fresh claims of other replicas
+    are left alone.
+
+    Messages are queued for the workers only once the outbox has started
+    with a transport; until then they stay pending in MongoDB and are picked
+    up by the next successful `start()`.
+    """
+
+    def __init__(self, outbox_collection, complaints_collection, transport,
+                 workers=WORKER_COUNT, max_attempts=MAX_ATTEMPTS, retry_base_delay=RETRY_BASE_DELAY,
+                 claim_timeout=CLAIM_TIMEOUT):
+        self.outbox = outbox_collection
+        self.complaints = complaints_collection
+        self.transport = transport
+        self.worker_count = workers
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.claim_timeout = claim_timeout
+        self.queue = asyncio.Queue()
+        self.workers = []
+        self.reclaimer = None
+        self.starter = None
+        self.accepting = False
+        self.retry_tasks = set()
+
+    async def start(self):
+        """Start the workers and requeue messages left pending by a previous run"""
+        await self.outbox.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+        if self.transport is None:
+            print("Email transport is not configured; complaint emails stay pending in the outbox")
+            return
+        # From here on enqueue() hands new messages to the workers; one the scan below also finds is
+        # queued twice, and the second claim of it finds nothing pending
+        self.accepting = True
+        await self._reclaim_stale()
+        # Pending messages keep their backoff: each is queued once its next_attempt_at has passed
+        now = datetime.now(timezone.utc)
+        async for doc in self.outbox.find({"status": "pending"}, {"_id": 1, "next_attempt_at": 1}):
+            delay = (_utc(doc.get("next_attempt_at")) - now).total_seconds() if doc.get("next_attempt_at") else 0
+            if delay > 0:
+                self._schedule_retry(doc["_id"], delay)
+            else:
+                self.queue.put_nowait(doc["_id"])
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        self.reclaimer = asyncio.create_task(self._reclaim_loop())
+
+    def launch(self, max_delay=START_MAX_DELAY):
+        """Start in the background, retrying with backoff until MongoDB answers"""
+        self.starter = asyncio.create_task(self._start_with_retry(max_delay))
+
+    async def _start_with_retry(self, max_delay):
+        delay = self.retry_base_delay
+        while True:
+            try:
+                await self.start()
+                return
+            except Exception as e:
+                print(f"Error starting email outbox, retrying in {delay:g}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    async def _reclaim_stale(self):
+        """Requeue messages whose sender stopped mid-send, i.e. claimed longer than claim_timeout ago"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.claim_timeout)
+        stale = {"status": "sending", "$or": [{"claimed_at": {"$lt": cutoff}}, {"claimed_at": {"$exists": False}}]}
+        async for doc in self.outbox.find(stale, {"_id": 1}):
+            # Only the replica that flips the status back queues the message
+            result = await self.outbox.update_one({"_id": doc["_id"], **stale}, {"$set": {"status": "pending"}})
+            if result.modified_count:
+                self.queue.put_nowait(doc["_id"])
+
+    async def _reclaim_loop(self):
+        while True:
+            await asyncio.sleep(self.claim_timeout)
+            try:
+                await self._reclaim_stale()
+            except Exception as e:
+                print(f"Error reclaiming stale emails: {e}")
+
+    async def stop(self):
+        tasks = self.workers + list(self.retry_tasks) + [task for task in (self.reclaimer, self.starter) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        self.reclaimer = None
+        self.starter = None
+        self.accepting = False
+        self.retry_tasks.clear()
+
+    async def enqueue(self, complaint_id, kind, to, subject, body, reply_to=None):
+        """Persist an email for the complaint and hand it to the workers once they are running"""
+        message_id = f"{complaint_id}:{kind}"
+        try:
+            await self.outbox.insert_one({
+                "_id": message_id,
+                "complaint_id": complaint_id,
+                "kind": kind,
+                "to": to,
+                "reply_to": reply_to,
+                "subject": subject,
+                "body": body,
+                "status": "pending",
+                "attempts": 0,
+                "created_at": datetime.now(timezone.utc),
+                "next_attempt_at": datetime.now(timezone.utc),
+            })
+        except DuplicateKeyError:
+            return message_id
+        if self.accepting:
+            self.queue.put_nowait(message_id)
+        return message_id
+
+    async def _worker(self):
+        while True:
+            message_id = await self.queue.get()
+            try:
+                await self._deliver(message_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error delivering email {message_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, message_id):
+        # Claim the message so another worker or replica doesn't send it too
+        message = await self.outbox.find_one_and_update(
+            {"_id": message_id, "status": "pending"},
+            {"$set": {"status": "sending", "claimed_at": datetime.now(timezone.utc)}, "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not message:
+            return
+        try:
+            await self.transport.send(message)
+        except Exception as e:
+            print(f"Failed to send {message['kind']} email for complaint {message['complaint_id']}: {e}")
+            if message["attempts"] >= self.max_attempts:
+                await self._set_status(message, "failed", last_error=str(e))
+                return
+            delay = self.retry_base_delay * 2 ** (message["attempts"] - 1)
+            await self._set_status(message, "pending", last_error=str(e),
+                                   next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=delay))
+            self._schedule_retry(message_id, delay)
+            return
+        print(f"Sent {message['kind']} email for complaint {message['complaint_id']} to {message['to']}")
+        await self._set_status(message, "sent", sent_at=datetime.now(timezone.utc))
+
+    def _schedule_retry(self, message_id, delay):
+        task = asyncio.create_task(self._requeue_later(message_id, delay))
+        self.retry_tasks.add(task)
+        task.add_done_callback(self.retry_tasks.discard)
+
+    async def _requeue_later(self, message_id, delay):
+        await asyncio.sleep(delay)
+        self.queue.put_nowait(message_id)
+
+    async def _set_status(self, message, status, **fields):
+        await self.outbox.update_one({"_id": message["_id"]}, {"$set": {"status": status, **fields}})
+        try:
+            complaint_filter = {"_id": ObjectId(message["complaint_id"])}
+        except InvalidId:
+            complaint_filter = {"_id": message["complaint_id"]}
+        await self.complaints.update_one(complaint_filter, {"$set": {f"email_status.{message['kind']}": status}})
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "retrying": len(self.retry_tasks),
+            "workers": len(self.workers),
+            "transport": self.transport is not None,
+        }
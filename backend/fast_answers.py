@@ -0,0 +1,125 @@
+import os
+import re
+from collections import Counter
+
+from prompt_context import CLOSE_SCORE, FACET_FIELDS, FACET_KEYWORDS, FIELD_LABELS, detect_facets
+from query_normalizer import MALAYALAM
+from service_catalog import ServiceCatalog, normalize_service_name
+
+MALAYALAM_PATTERN = re.compile(f"[{MALAYALAM}]")
+
+# A question is answered from the catalog only when the service matched at least this well
+FAST_PATH_MIN_SCORE = int(os.getenv("FAST_PATH_MIN_SCORE", 95))
+# Rows scoring the same as the best one (e.g. "Birth Certificate Application" and "... Download") get a section each
+MAX_SECTIONS = 2
+# Columns holding ";"-separated lists, shown as bullets
+LIST_FIELDS = {"required_documents", "contact_info"}
+
+WORD_PATTERN = re.compile(f"[\\w{MALAYALAM}']+")
+# Words that don't change what a lookup question asks for; anything else sends it to the LLM
+FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "what's", "whats", "which", "how", "much", "many", "long",
+    "for", "of", "to", "in", "on", "at", "from", "with", "and", "or", "my", "me", "i", "we", "you", "it", "this",
+    "do", "does", "did", "can", "will", "be", "need", "needed", "needs", "get", "getting", "give", "tell",
+    "show", "list", "know", "want", "please", "pls", "plz", "about", "any", "there", "kerala", "take", "takes",
+    # Manglish question words left over after QueryNormalizer
+    "ethra", "entha", "enthanu", "aanu", "venam", "ethokke", "avashyamaya", "undo",
+}
+FACET_WORDS = {facet: {word for phrase in phrases for word in phrase.split()} for facet, phrases in FACET_KEYWORDS.items()}
+
+
+def _words(text):
+    return WORD_PATTERN.findall(text.lower())
+
+
+def _singular(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+class FastAnswerer:
+    """Answer single-column lookups ("fees for ration card") straight from the catalog.
+
+    A question qualifies when it asks about exactly one facet, the best
+    service scores at least `min_score`, every word of the service name
+    appears in it as a whole word, and every other word in it is either
+    part of the service name or a filler word, so there is nothing left for
+    an LLM to reason about. The whole-word check keeps a fuzzy match like
+    "new driving license" inside "renew driving license" off the fast path. The reply is Markdown in the same
+    style the LLM is asked for. Anything less certain returns None and
+    goes to the LLM, as do questions written in Malayalam script, which
+    should be answered in Malayalam.
+    """
+
+    def __init__(self, min_score=FAST_PATH_MIN_SCORE, close_score=CLOSE_SCORE, max_sections=MAX_SECTIONS):
+        self.min_score = min_score
+        self.close_score = close_score
+        self.max_sections = max_sections
+        self.answered = 0
+        self.fallbacks = Counter()
+
+    def answer(self, query, matches, message=""):
+        """Return a templated reply for the normalized question, or None to use the LLM"""
+        if MALAYALAM_PATTERN.search(message):
+            reply, reason = None, "malayalam"
+        else:
+            reply, reason = self._answer(query, matches)
+        if reply is None:
+            self.fallbacks[reason] += 1
+        else:
+            self.answered += 1
+        return reply
+
+    def _answer(self, query, matches):
+        facets = detect_facets(query)
+        if len(facets) != 1:
+            return None, "facets"
+        if not matches or matches[0][1] < self.min_score:
+            return None, "low_score"
+        best = matches[0][1]
+        rows = [row for row, score in matches if best - score <= self.close_score]
+        # Close rows that agree on the answer are one answer
+        if len({tuple(row.get(field, "") for field in FACET_FIELDS[facets[0]]) for row in rows}) == 1:
+            rows = rows[:1]
+        if len(rows) > self.max_sections:
+            return None, "ambiguous"
+        query_words = {_singular(word) for word in _words(query)}
+        for row in rows:
+            name_words = ServiceCatalog.required_words(normalize_service_name(row["service_name"]))
+            if any(_singular(word) not in query_words for word in name_words):
+                return None, "partial_name"
+        known = FILLER_WORDS | FACET_WORDS[facets[0]]
+        for row in rows:
+            known |= {_singular(word) for word in _words(row["service_name"])}
+        if any(word not in known and _singular(word) not in known for word in _words(query)):
+            return None, "uncovered"
+        sections = [self.render(row, facets[0]) for row in rows]
+        if not all(sections):
+            return None, "empty_field"
+        return "\n\n".join(sections) + "\n\n*From the official Kerala government service catalog.*", None
+
+    def render(self, row, facet):
+        """Markdown section for one service, or "" when the row has nothing for the facet"""
+        blocks = []
+        for field in FACET_FIELDS[facet]:
+            value = row.get(field, "")
+            if not value or (field == "relevant_links" and value.rstrip("/") == row.get("official_portal", "").rstrip("/")):
+                continue
+            items = [item.strip() for item in value.split(";") if item.strip()]
+            if field in LIST_FIELDS and len(items) > 1:
+                blocks.append(f"**{FIELD_LABELS[field]}:**\n" + "\n".join(f"- {item}" for item in items))
+            else:
+                blocks.append(f"**{FIELD_LABELS[field]}:** {value}")
+        if not blocks:
+            return ""
+        return f"## {row['service_name']}\n\n" + "\n\n".join(blocks)
+
+    def stats(self):
+        fallbacks = sum(self.fallbacks.values())
+        total = self.answered + fallbacks
+        return {
+            "answered": self.answered,
+            "fallbacks": dict(self.fallbacks),
+            "answer_rate": round(self.answered / total, 3) if total else 0.0,
+            "min_score": self.min_score,
+        }
+
@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+
+
+class GenerationRegistry:
+    """Tracks in-flight LLM generations so a client can cancel one by id"""
+
+    def __init__(self):
+        self.active = {}
+        self.cancelled_count = 0
+
+    def start(self, generation_id=None):
+        """Register a generation and return its id and cancel event.
+
+        A requested id that is already running gets a random suffix, so two
+        requests never share a cancel event; callers must report the
+        returned id back to the client.
+        """
+        generation_id = generation_id or uuid.uuid4().hex
+        if generation_id in self.active:
+            generation_id = f"{generation_id}-{uuid.uuid4().hex[:8]}"
+        cancel_event = asyncio.Event()
+        self.active[generation_id] = cancel_event
+        return generation_id, cancel_event
+
+    def cancel(self, generation_id):
+        """Ask a running generation to stop; returns False when it isn't running"""
+        cancel_event = self.active.get(generation_id)
+        if cancel_event is None:
+            return False
+        cancel_event.set()
+        self.cancelled_count += 1
+        return True
+
+    def finish(self, generation_id, cancel_event=None):
+        """Forget a generation; safe to call more than once.
+
+        With `cancel_event`, the entry is only removed while it still belongs
+        to that generation.
+        """
+        if cancel_event is None or self.active.get(generation_id) is cancel_event:
+            self.active.pop(generation_id, None)
+
+    def stats(self):
+        return {"active": len(self.active), "cancelled": self.cancelled_count}
+
+
+async def watch_stream(request, chunks, cancel_event, tick=1.0):
+    """Relay chunks from an upstream generator until it ends or nobody is listening.
+
+    Yields each chunk, and None whenever the upstream stays quiet for `tick`
+    seconds so callers can send keepalives. The stream stops when the client
+    disconnects or `cancel_event` is set, and the upstream generator is
+    closed in every case so the LLM stops generating. After an early stop
+    `cancel_event` is set, which tells callers the reply is incomplete.
+    """
+    next_chunk = None
+    finished = False
+    cancel_wait = asyncio.ensure_future(cancel_event.wait())
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+            done, _ = await asyncio.wait({next_chunk, cancel_wait}, timeout=tick,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if cancel_event.is_set() or await request.is_disconnected():
+                print("Generation cancelled or client disconnected, closing the LLM stream")
+                cancel_event.set()
+                break
+            if not done:
+                yield None
+                continue
+            current, next_chunk = next_chunk, None
+            try:
+                chunk = current.result()
+            except StopAsyncIteration:
+                finished = True
+                break
+            yield chunk
+    finally:
+        cancel_wait.cancel()
+        # Cancelling the pending read closes the upstream generator chain
+        if next_chunk is not None and not next_chunk.done():
+            next_chunk.cancel()
+        elif not finished:
+            asyncio.ensure_future(chunks.aclose())
@@ -0,0 +1,64 @@
+import re
+from typing import NamedTuple
+
+from service_catalog import APOSTROPHES, PARENTHESISED, normalize_service_name
+
+PUNCTUATION = re.compile(r'[^\w\s]')
+# Endings a phrase may take and still count: "bills", "taxes", "licensed", "pensioners"
+SUFFIXES = r'(?:s|es|d|ed|r|er|rs|ers)?'
+
+
+def _clean(text):
+    """Lowercase, drop apostrophes and turn other punctuation into spaces ("d&o" -> "d o")"""
+    text = PUNCTUATION.sub(' ', APOSTROPHES.sub('', text.lower()))
+    return ' '.join(text.split())
+
+
+class IntentMatch(NamedTuple):
+    intent: str  # "gov", "greeting" or "off_topic"
+    keywords: list
+
+
+class IntentClassifier:
+    """Classify a message as a greeting, a government service question or off-topic.
+
+    All phrases are compiled into one alternation regex, longest first, with
+    word boundaries on both sides, so a message is scanned once and "bill"
+    no longer matches "billion" nor "hi" matches "this". Punctuation is
+    ignored in both phrases and messages. A service counts by its full name
+    and its name without generic words, each also without the parenthesised
+    alias: "Voter Registration (EPIC)" matches "voter registration".
+    """
+
+    def __init__(self, greetings, gov_keywords, rows=()):
+        self.phrase_intent = {}
+        for phrase in greetings:
+            self._add(phrase, "greeting")
+        for phrase in gov_keywords:
+            self._add(phrase, "gov")
+        for row in rows:
+            self._add(row.get('category', ''), "gov")
+            name = row.get('service_name', '')
+            for variant in (name, normalize_service_name(name)):
+                self._add(variant, "gov")
+                self._add(PARENTHESISED.sub(' ', variant), "gov")
+        phrases = sorted(self.phrase_intent, key=len, reverse=True)
+        self.pattern = re.compile(r'(?<!\w)(' + '|'.join(map(re.escape, phrases)) + r')' + SUFFIXES + r'(?!\w)')
+
+    def _add(self, phrase, intent):
+        phrase = _clean(phrase)
+        # A phrase listed as both keeps the "gov" intent
+        if phrase and self.phrase_intent.get(phrase) != "gov":
+            self.phrase_intent[phrase] = intent
+
+    def classify(self, message):
+        """Return the intent of the message and the phrases that matched it"""
+        keywords = [match.group(1) for match in self.pattern.finditer(_clean(message))]
+        intents = {self.phrase_intent[keyword] for keyword in keywords}
+        if "gov" in intents:
+            intent = "gov"
+        elif "greeting" in intents:
+            intent = "greeting"
+        else:
+            intent = "off_topic"
+        return IntentMatch(intent, keywords)
@@ -0,0 +1,401 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import timedelta
+
+import google.generativeai as genai
+import httpx
+
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL", "models/gemini-2.5-pro")
+# "off" (the default) sends the instruction and the trimmed rows matched for the question.
+# "cached" registers the instruction and the whole catalog as Gemini cached content; every
+# request then also bills the catalog's tokens, at the cached-token rate, plus storage per hour
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "off").lower()
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", 3600))
+# Renew a cache this long before it expires, and wait this long after a failed attempt
+CACHE_REFRESH_MARGIN = 300
+CACHE_RETRY_SECONDS = 300
+
+
+def full_prompt(system_prompt, context=""):
+    """The instruction followed by the per-request service data"""
+    return system_prompt + "\n" + context if context else system_prompt
+
+
+class LLMClient:
+    """Gemini model handle shared by every request.
+
+    genai.configure() drops the library's cached clients, so it runs once
+    here instead of per request. The model keeps its gRPC channel open
+    between calls, and warmup() opens that channel before the first user
+    message arrives.
+    """
+
+    def __init__(self, model_name=GEMINI_MODEL_NAME):
+        self.model_name = model_name
+        self.model = None
+        self.last_warmup_ms = None
+        self.last_error = None
+
+    def start(self):
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+        genai.configure(api_key=gemini_api_key)
+        self.model = genai.GenerativeModel(self.model_name)
+        return self.model
+
+    def get_model(self):
+        if self.model is None:
+            self.start()
+        return self.model
+
+    async def warmup(self):
+        """Make one cheap call to open the connection; returns True when Gemini answered"""
+        start = time.perf_counter()
+        try:
+            await self.get_model().count_tokens_async("ping")
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Gemini warmup failed: {e}")
+            return False
+        self.last_warmup_ms = round((time.perf_counter() - start) * 1000, 1)
+        self.last_error = None
+        return True
+
+    def health(self):
+        return {
+            "model": self.model_name,
+            "configured": self.model is not None,
+            "last_warmup_ms": self.last_warmup_ms,
+            "last_error": self.last_error,
+        }
+
+
+class GeminiCacheBackend:
+    """The SDK calls GeminiContextCache makes, kept apart so tests can pass a fake"""
+
+    def supports(self, mode):
+        return mode == "cached" and hasattr(genai, "caching")
+
+    def create_cached_model(self, model_name, instruction, catalog, ttl):
+        """Upload the context once; returns the model bound to it and the cache handle"""
+        cache = genai.caching.CachedContent.create(
+            model=model_name,
+            display_name="kerala-services-catalog",
+            system_instruction=instruction,
+            contents=[catalog],
+            ttl=timedelta(seconds=ttl),
+        )
+        return genai.GenerativeModel.from_cached_content(cache), cache
+
+    def delete(self, handle):
+        handle.delete()
+
+
+class _CachedContext:
+    __slots__ = ("model", "handle", "expires_at")
+
+    def __init__(self, model, handle, expires_at):
+        self.model = model
+        self.handle = handle
+        self.expires_at = expires_at
+
+
+class GeminiContextCache:
+    """Keeps the static instruction and service catalog on Gemini's side.
+
+    Opt-in (GEMINI_CONTEXT_CACHE=cached). For each distinct instruction a
+    model is prepared once with the instruction and the whole catalog as
+    cached content; a request then uploads only the matched rows and the
+    user message, but the model still reads the cached catalog, so its
+    tokens are billed on every request at the cached rate. That is more
+    input than the trimmed prompt the default sends, and only pays off with
+    a much larger catalog. Models are built in the background; until one is ready, or
+    when caching isn't available, model_for() returns None and the caller
+    sends the full prompt as before. set_catalog() drops every prepared
+    model when the catalog text changes, and caches are renewed before
+    their TTL runs out.
+    """
+
+    def __init__(self, model_name, mode=GEMINI_CONTEXT_CACHE, ttl=GEMINI_CACHE_TTL, backend=None):
+        self.model_name = model_name
+        self.mode = mode
+        self.ttl = ttl
+        self.backend = backend or GeminiCacheBackend()
+        self.enabled = mode == "cached" and self.backend.supports(mode)
+        if mode == "cached" and not self.enabled:
+            print("GEMINI_CONTEXT_CACHE=cached is not supported by the installed google-generativeai; sending full prompts")
+        elif mode not in ("off", "cached", ""):
+            print(f"Unknown GEMINI_CONTEXT_CACHE={mode}; sending full prompts")
+        self.catalog = ""
+        self.version = None
+        self.entries = {}
+        self.pending = {}
+        self.retry_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.last_error = None
+
+    def set_catalog(self, catalog):
+        """Use a new catalog text; returns True when it differs from the current one"""
+        version = hashlib.sha256(catalog.encode("utf-8")).hexdigest()[:12]
+        if version == self.version:
+            return False
+        self.catalog = catalog
+        self.version = version
+        old = list(self.entries.values())
+        self.entries.clear()
+        self.retry_at = 0.0
+        for entry in old:
+            self._delete_later(entry.handle)
+        return True
+
+    def model_for(self, instruction):
+        """A model with `instruction` and the catalog preloaded, or None to send the full prompt"""
+        if not self.enabled or not self.catalog:
+            return None
+        now = time.monotonic()
+        entry = self.entries.get(instruction)
+        if entry is not None and entry.expires_at - now > CACHE_REFRESH_MARGIN:
+            self.hits += 1
+            return entry.model
+        self.misses += 1
+        if instruction not in self.pending and now >= self.retry_at:
+            self.pending[instruction] = asyncio.create_task(self._prepare(instruction, self.version))
+        if entry is not None and entry.expires_at > now:
+            return entry.model
+        return None
+
+    async def _prepare(self, instruction, version):
+        try:
+            model, handle = await asyncio.to_thread(
+                self.backend.create_cached_model, self.model_name, instruction, self.catalog, self.ttl)
+            expires_at = time.monotonic() + self.ttl
+            if version != self.version:
+                # The catalog changed while this one was being uploaded
+                self._delete_later(handle)
+                return
+            old = self.entries.get(instruction)
+            self.entries[instruction] = _CachedContext(model, handle, expires_at)
+            if old is not None:
+                self._delete_later(old.handle)
+            self.refreshes += 1
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            self.retry_at = time.monotonic() + CACHE_RETRY_SECONDS
+            print(f"Gemini context cache failed: {e}")
+        finally:
+            self.pending.pop(instruction, None)
+
+    def _delete_later(self, handle):
+        if handle is not None:
+            asyncio.ensure_future(self._delete(handle))
+
+    async def _delete(self, handle):
+        try:
+            await asyncio.to_thread(self.backend.delete, handle)
+        except Exception as e:
+            print(f"Error deleting Gemini context cache: {e}")
+
+    async def close(self):
+        for task in list(self.pending.values()):
+            task.cancel()
+        for entry in list(self.entries.values()):
+            if entry.handle is not None:
+                await self._delete(entry.handle)
+        self.entries.clear()
+
+    def stats(self):
+        return {
+            "mode": self.mode if self.enabled else "off",
+            "catalog_version": self.version,
+            "contexts": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "last_error": self.last_error,
+        }
+
+
+class LLMProvider:
+    """A backend that streams a reply for a system prompt and a user message.
+
+    `context` is the service data matched for this request; the system
+    prompt itself is the same for every request. `timeout` bounds the wait
+    for the first chunk and for each chunk after it, so a stalled provider
+    can be abandoned for the next one in the route.
+    """
+
+    name = "base"
+
+    def __init__(self, timeout=60.0):
+        self.timeout = timeout
+
+    def stream(self, system_prompt, message, context=""):
+        """Return an async iterator of reply text chunks"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, client, timeout=float(os.getenv("GEMINI_TIMEOUT", 60)), context_cache=None):
+        super().__init__(timeout)
+        self.client = client
+        self.context_cache = context_cache
+
+    async def stream(self, system_prompt, message, context=""):
+        model = self.context_cache.model_for(system_prompt) if self.context_cache is not None else None
+        if model is not None:
+            # The instruction and catalog already live in the cached context
+            prompt = (context + "\n" if context else "") + "User: " + message
+        else:
+            model = self.client.get_model()
+            prompt = full_prompt(system_prompt, context) + "\nUser: " + message
+        # Async client so a long generation doesn't block the event loop for other requests
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            # Handle multi-part responses
+            if hasattr(chunk, 'parts') and chunk.parts:
+                for part in chunk.parts:
+                    if hasattr(part, 'text') and part.text:
+                        yield part.text
+            elif hasattr(chunk, 'text') and chunk.text:
+                yield chunk.text
+
+    async def close(self):
+        if self.context_cache is not None:
+            await self.context_cache.close()
+
+
+class OllamaProvider(LLMProvider):
+    """Small local model served by Ollama's /api/chat endpoint"""
+
+    name = "ollama"
+
+    def __init__(self, base_url=os.getenv("OLLAMA_URL", "http://localhost:11434"),
+                 model=os.getenv("OLLAMA_MODEL", "qwen:1.8b"),
+                 timeout=float(os.getenv("OLLAMA_TIMEOUT", 10))):
+        super().__init__(timeout)
+        self.model = model
+        self.http = httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(timeout, connect=2.0))
+
+    async def stream(self, system_prompt, message, context=""):
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": full_prompt(system_prompt, context)},
+                {"role": "user", "content": message}
+            ],
+            "stream": True,
+        }
+        async with self.http.stream("POST", "/api/chat", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                text = data.get("message", {}).get("content")
+                if text:
+                    yield text
+                if data.get("done"):
+                    break
+
+    async def close(self):
+        await self.http.aclose()
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic provider for offline tests; replies with a fixed text word by word"""
+
+    name = "fake"
+
+    def __init__(self, reply="This is a test reply.", delay=0.0, fail=False, timeout=5.0):
+        super().__init__(timeout)
+        self.reply = reply
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    async def stream(self, system_prompt, message, context=""):
+        self.calls.append((full_prompt(system_prompt, context), message))
+        if self.fail:
+            raise RuntimeError("Fake provider failure")
+        for word in self.reply.split(" "):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word + " "
+
+
+class LLMRouter:
+    """Picks the provider chain for a question and falls back on errors and timeouts.
+
+    Questions grounded in a matched catalog row are cheap enough for the local
+    model, so they try it first and escalate to the primary provider only if
+    it fails. Everything else goes straight to the primary provider. Once a
+    provider has produced output the reply can't be retracted, so a later
+    failure ends the stream with an [ERROR] chunk instead of falling back.
+    """
+
+    def __init__(self, primary, local=None):
+        self.primary = primary
+        self.local = local
+        self.served = {}
+        self.failures = 0
+
+    def route(self, has_context):
+        if has_context and self.local is not None:
+            return [self.local, self.primary]
+        return [self.primary]
+
+    async def stream(self, system_prompt, message, has_context=False, meta=None, context=""):
+        """Yield reply chunks; the provider that answered is stored in meta["provider"]"""
+        errors = []
+        for provider in self.route(has_context):
+            chunks = provider.stream(system_prompt, message, context)
+            started = False
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), provider.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if not started:
+                        started = True
+                        if meta is not None:
+                            meta["provider"] = provider.name
+                    yield chunk
+                if started:
+                    self.served[provider.name] = self.served.get(provider.name, 0) + 1
+                    return
+                errors.append(f"{provider.name}: empty reply")
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    e = f"no output within {provider.timeout}s"
+                print(f"LLM provider {provider.name} failed: {e}")
+                if started:
+                    yield f"[ERROR] {e}"
+                    return
+                errors.append(f"{provider.name}: {e}")
+            finally:
+                await chunks.aclose()
+            self.failures += 1
+        yield f"[ERROR] {'; '.join(errors)}"
+
+    async def close(self):
+        await self.primary.close()
+        if self.local is not None:
+            await self.local.close()
+
+    def stats(self):
+        return {"served": dict(self.served), "failures": self.failures}
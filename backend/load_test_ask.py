@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Load test: check that /ask generations don't block other requests on the worker.
+
+Gemini is replaced by a fake model that streams for a few seconds and MongoDB
+by mongomock-motor, so no API key, database or network is needed. Run from
+the backend directory (exits non-zero on failure):
+
+    pip install mongomock-motor
+    python load_test_ask.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import google.generativeai as genai
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+GENERATION_SECONDS = 3.0
+CONCURRENT_ASKS = 10
+PROBES = 20
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+        self.parts = []
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel and streams slowly without blocking"""
+
+    def __init__(self, model_name, **kwargs):
+        self.model_name = model_name
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        async def chunks():
+            for i in range(10):
+                await asyncio.sleep(GENERATION_SECONDS / 10)
+                yield FakeChunk(f"part {i} ")
+        return chunks()
+
+
+async def run_load_test():
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    genai.GenerativeModel = FakeModel
+    genai.configure = lambda **kwargs: None
+    import database
+    import main
+
+    # In-memory MongoDB so the probes exercise the real complaint queries
+    database.connect(AsyncMongoMockClient())
+    # Fresh cache so every /ask really generates
+    main.ANSWER_CACHE.entries.clear()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        async def ask(i):
+            response = await client.post(
+                "/ask",
+                json={"message": f"how to get birth certificate request {i}"},
+                headers={"x-frontend": "web"},
+            )
+            return response.json()["reply"]
+
+        async def probe(i):
+            # Register a complaint and look it up again; this service has no department email to queue
+            start = time.perf_counter()
+            registered = (await client.post("/register_complaint", json={
+                "name": "Load Test", "contact": f"90000000{i:02d}", "service": "ration card",
+                "complaint_text": "Probe complaint",
+            })).json()
+            tracked = (await client.post("/track_complaint", json={"complaint_id": registered.get("complaint_id")})).json()
+            return time.perf_counter() - start, registered["success"] and tracked["success"]
+
+        start = time.perf_counter()
+        ask_tasks = [asyncio.create_task(ask(i)) for i in range(CONCURRENT_ASKS)]
+        await asyncio.sleep(0.2)
+        probe_latencies = []
+        probes_ok = True
+        for i in range(PROBES):
+            latency, probe_ok = await probe(i)
+            probe_latencies.append(latency)
+            probes_ok = probes_ok and probe_ok
+            await asyncio.sleep(0.05)
+        replies = await asyncio.gather(*ask_tasks)
+        elapsed = time.perf_counter() - start
+
+    serial_time = GENERATION_SECONDS * CONCURRENT_ASKS
+    worst_probe = max(probe_latencies)
+    print(f"{CONCURRENT_ASKS} concurrent /ask generations of {GENERATION_SECONDS}s each took {elapsed:.2f}s "
+          f"(serial would be {serial_time:.0f}s)")
+    print(f"/register_complaint + /track_complaint during generation: worst {worst_probe * 1000:.1f} ms "
+          f"over {PROBES} calls")
+
+    if not probes_ok:
+        print("❌ A complaint probe failed")
+        return False
+    ok = all(reply.startswith("part 0") for reply in replies)
+    if ok and elapsed < GENERATION_SECONDS * 2 and worst_probe < 0.5:
+        print("✅ Generations ran concurrently and other endpoints stayed responsive")
+        return True
+    print("❌ The event loop was blocked during generation")
+    return False
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(run_load_test())
+    sys.exit(0 if ok else 1)
@@ -1,20 +1,26 @@
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 import requests
 import json
-import csv
 import os
+import time
 import httpx
-from fastapi.responses import StreamingResponse
-import google.generativeai as genai
-from pymongo import MongoClient
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from bson import ObjectId
-from rapidfuzz import fuzz
-# Email imports
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
+from datetime import datetime, timezone
+from catalog_loader import CatalogHolder
+from response_cache import ResponseCache
+from semantic_cache import DEFAULT_THRESHOLD, HashingVectorizer, SemanticCache
+import database
+from email_outbox import EmailOutbox, SendGridTransport
+from sse import HEARTBEAT_SECONDS, SSE_HEADERS, sse_replay, sse_stream
+from generations import GenerationRegistry, watch_stream
+from llm import LLMClient, LLMRouter, GeminiContextCache, GeminiProvider, OllamaProvider, FakeProvider
+from fast_answers import FastAnswerer
+from prompt_context import MAX_ROWS, GENERAL_INSTRUCTION, GROUNDED_INSTRUCTION, build_context, catalog_text, detect_facets
 
 app = FastAPI()
 
@@ -70,42 +76,134 @@ GOV_KEYWORDS = [
 ]
 
 
-# Load CSV into memory at startup
-CSV_DATA = []
-def load_csv():
-    import re
-    csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gov_services.csv')
-    if not os.path.exists(csv_path):
-        csv_path = os.path.join(os.path.dirname(__file__), 'gov_services.csv')
-    if not os.path.exists(csv_path):
-        return []
-    with open(csv_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        return [row for row in reader]
-CSV_DATA = load_csv()
-
-def find_service_info(user_message):
-    import re
-    best_score = 0
-    best_row = None
-    for row in CSV_DATA:
-        service = row['service_name'].lower()
-        service_main = re.sub(r'\b(application|registration|download|get|apply|for|the|a|an|of)\b', '', service).strip()
-        # Fuzzy match: compare service_main to user_message
-        score = fuzz.partial_ratio(service_main, user_message)
-        if score > best_score:
-            best_score = score
-            best_row = row
-    # Return the best match if score is high enough
-    if best_score > 80:
-        return best_row
-    return None
-
-# MongoDB setup
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-client = MongoClient(MONGO_URI)
-db = client["kerala_services"]
-complaints_collection = db["complaints"]
+# Service catalog (CATALOG_PATH), loaded from its precompiled snapshot when the CSV is unchanged.
+# Requests read CATALOG.current once, so a reload never swaps data under a running request.
+CATALOG = CatalogHolder(GREETINGS, GOV_KEYWORDS)
+CATALOG.load()
+# Set CATALOG_WATCH_SECONDS to reload automatically when the CSV changes
+CATALOG_WATCH_SECONDS = float(os.getenv("CATALOG_WATCH_SECONDS", 0))
+# Token for POST /admin/reload_catalog; the endpoint is disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+@app.on_event("startup")
+async def startup_event():
+    """Open the shared MongoDB client, start the email outbox workers and warm up Gemini"""
+    database.connect()
+    try:
+        await database.ensure_indexes()
+    except Exception as e:
+        print(f"Error creating MongoDB indexes: {e}")
+    if ANSWER_CACHE_PERSIST:
+        await ANSWER_CACHE.connect(database.get_collection("answer_cache"))
+    global EMAIL_OUTBOX
+    sendgrid_api_key = os.getenv("SENDGRID_API_KEY")
+    if not sendgrid_api_key:
+        print("SENDGRID_API_KEY environment variable is not set.")
+    EMAIL_OUTBOX = EmailOutbox(
+        database.get_collection("email_outbox"),
+        database.get_collection("complaints"),
+        SendGridTransport(sendgrid_api_key, os.getenv("SENDER_EMAIL", "haribro00123@gmail.com")) if sendgrid_api_key else None,
+    )
+    # Starts in the background and keeps retrying, so a MongoDB hiccup at boot doesn't leave it idle
+    EMAIL_OUTBOX.launch()
+    try:
+        LLM_CLIENT.start()
+        await LLM_CLIENT.warmup()
+    except Exception as e:
+        print(f"Error starting Gemini client: {e}")
+    if CATALOG_WATCH_SECONDS > 0:
+        CATALOG.watch(CATALOG_WATCH_SECONDS)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the email workers and catalog watcher and close the LLM and MongoDB clients"""
+    await CATALOG.stop()
+    if EMAIL_OUTBOX is not None:
+        await EMAIL_OUTBOX.stop()
+    await LLM_ROUTER.close()
+    database.close()
+
+# Complaint email outbox, created on startup once MongoDB is connected
+EMAIL_OUTBOX = None
+# Gemini model shared across requests
+LLM_CLIENT = LLMClient()
+# Static instruction + catalog kept on Gemini's side when GEMINI_CONTEXT_CACHE is set
+GEMINI_CONTEXT = GeminiContextCache(LLM_CLIENT.model_name)
+GEMINI_CONTEXT.set_catalog(catalog_text(CATALOG.current.rows))
+
+def build_llm_router():
+    """Gemini answers by default; OLLAMA_ENABLED=1 routes grounded questions to a local model first"""
+    if os.getenv("LLM_PROVIDER", "").lower() == "fake":
+        return LLMRouter(FakeProvider())
+    local = None
+    if os.getenv("OLLAMA_ENABLED", "").lower() in ("1", "true", "yes"):
+        local = OllamaProvider()
+    return LLMRouter(GeminiProvider(LLM_CLIENT, context_cache=GEMINI_CONTEXT), local=local)
+
+LLM_ROUTER = build_llm_router()
+# In-flight /ask generations, so clients can cancel one by id
+GENERATIONS = GenerationRegistry()
+
+# Answer cache for /ask; set ANSWER_CACHE_PERSIST=1 to also keep answers in MongoDB
+ANSWER_CACHE_PERSIST = os.getenv("ANSWER_CACHE_PERSIST", "").lower() in ("1", "true", "yes")
+ANSWER_CACHE = ResponseCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", 512)),
+    ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL", 6 * 3600)),
+)
+
+def fit_vectorizer(rows):
+    return HashingVectorizer().fit(f"{row['service_name']} {row['description']}" for row in rows)
+
+# Optional paraphrase-aware cache layer behind ANSWER_CACHE
+SEMANTIC_CACHE = None
+if os.getenv("SEMANTIC_CACHE_ENABLED", "").lower() in ("1", "true", "yes"):
+    SEMANTIC_CACHE = SemanticCache(
+        fit_vectorizer(CATALOG.current.rows),
+        capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", 1024)),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD)),
+    )
+
+async def refresh_catalog_caches(catalog):
+    """Answers and the Gemini context were built from the old catalog, so drop them after a reload"""
+    await ANSWER_CACHE.clear()
+    if SEMANTIC_CACHE is not None:
+        SEMANTIC_CACHE.clear(fit_vectorizer(catalog.rows))
+    GEMINI_CONTEXT.set_catalog(catalog_text(catalog.rows))
+
+CATALOG.on_swap.append(refresh_catalog_caches)
+
+async def lookup_cached_reply(cache_key, query, service_name, facets):
+    reply = await ANSWER_CACHE.get(cache_key)
+    if not reply and SEMANTIC_CACHE is not None:
+        reply = SEMANTIC_CACHE.lookup(query, service_name, facets)
+    return reply
+
+async def store_reply(cache_key, query, service_name, facets, reply):
+    await ANSWER_CACHE.set(cache_key, reply)
+    if SEMANTIC_CACHE is not None:
+        SEMANTIC_CACHE.add(query, service_name, reply, facets)
+
+# Single-column lookups ("fees for ration card") answered from the catalog without the LLM
+FAST_ANSWERS = FastAnswerer() if os.getenv("FAST_PATH_ENABLED", "1").lower() in ("1", "true", "yes") else None
+
+def replay_stream(reply):
+    """Stream a cached reply line by line, the way the LLM stream arrives"""
+    for line in reply.splitlines(keepends=True):
+        yield line
+
+def fixed_reply(text, is_web, is_sse=False, meta=None, served_by=None):
+    """Answer with a ready-made text in the format the client asked for.
+
+    `served_by` ("fast_path" or "cache") is reported in the X-Served-By
+    header and, for web clients, in the JSON body.
+    """
+    headers = {"X-Served-By": served_by} if served_by else {}
+    if is_sse:
+        return StreamingResponse(sse_replay(text, meta or {}), media_type="text/event-stream",
+                                 headers={**SSE_HEADERS, **headers})
+    if is_web:
+        return JSONResponse({"reply": text, "served_by": served_by} if served_by else {"reply": text}, headers=headers)
+    return StreamingResponse(replay_stream(text), media_type="text/plain", headers=headers)
 
 @app.post("/register_complaint")
 async def register_complaint(request: Request):
@@ -119,16 +217,6 @@ async def register_complaint(request: Request):
         email = data.get("email", "")  # New field for user's email
         if not complaint_text or not service:
             return {"success": False, "message": "Service and complaint text are required."}
-        complaint_doc = {
-            "name": name,
-            "contact": contact,
-            "service": service,
-            "complaint_text": complaint_text,
-            "email": email  # Store user's email in MongoDB
-        }
-        result = complaints_collection.insert_one(complaint_doc)
-        complaint_id = str(result.inserted_id)
-
         # Email mapping for departments
         department_emails = {
             "voter id": "hariusha200@gmail.com",
@@ -137,11 +225,42 @@ async def register_complaint(request: Request):
         # Find the email for the service (case-insensitive match)
         service_key = service.strip().lower()
         recipient_email = department_emails.get(service_key)
+        complaint_doc = {
+            "name": name,
+            "contact": contact,
+            "service": service,
+            "complaint_text": complaint_text,
+            "email": email,  # Store user's email in MongoDB
+            "created_at": datetime.now(timezone.utc),
+        }
         if recipient_email:
-            # Prepare email using SendGrid API (free tier allows 100 emails/day)
-            sender_email = os.getenv("SENDER_EMAIL", "haribro00123@gmail.com")
-            subject = f"New Complaint Registered: {service}"
-            body = f"""
+            complaint_doc["email_status"] = {"department": "pending"}
+            if email:
+                complaint_doc["email_status"]["user"] = "pending"
+        complaint_id = await database.insert_complaint(complaint_doc)
+
+        # The complaint is stored from here on, so a failure to queue its emails must not fail the
+        # request; the client would retry and register the complaint twice
+        if recipient_email:
+            try:
+                await queue_complaint_emails(complaint_id, recipient_email, name, contact, service, complaint_text, email)
+            except Exception as e:
+                print(f"Error queueing emails for complaint {complaint_id}: {e}")
+                failed = {f"email_status.{kind}": "failed" for kind in complaint_doc["email_status"]}
+                try:
+                    await database.get_collection("complaints").update_one({"_id": ObjectId(complaint_id)}, {"$set": failed})
+                except Exception as e:
+                    print(f"Error updating email status for complaint {complaint_id}: {e}")
+
+        return {"success": True, "message": "Complaint registered successfully.", "complaint_id": complaint_id}
+    except Exception as e:
+        return {"success": False, "message": f"Error: {str(e)}"}
+
+async def queue_complaint_emails(complaint_id, recipient_email, name, contact, service, complaint_text, email):
+    """Queue the department email and, when the user gave an address, their copy in the outbox"""
+    # Emails are queued in the outbox and sent by background workers
+    subject = f"New Complaint Registered: {service}"
+    body = f"""
 A new complaint has been registered for the service: {service}
 
 Name: {name}
@@ -150,42 +269,11 @@ Email: {email}
 Complaint: {complaint_text}
 Complaint ID: {complaint_id}
 """
-            
-            try:
-                sendgrid_api_key = os.getenv("SENDGRID_API_KEY")
-                
-                if not sendgrid_api_key:
-                    print("SENDGRID_API_KEY environment variable is not set.")
-                    raise ValueError("SENDGRID_API_KEY environment variable is required")
-                
-                print(f"Attempting to send email to: {recipient_email} from: {sender_email}")
-                
-                # Create SendGrid message
-                from_email = Email(sender_email)
-                to_email = To(recipient_email)
-                content = Content("text/plain", body)
-                mail = Mail(from_email, to_email, subject, content)
-                
-                # Add reply-to header if user provided email
-                if email:
-                    mail.reply_to = Email(email)
-                
-                # Send email via SendGrid
-                sg = SendGridAPIClient(sendgrid_api_key)
-                response = sg.send(mail)
-                
-                try:
-                    response = sg.send(mail)
-                    print(f"Email sent successfully via SendGrid with status code: {response.status_code}")
-                    print(f"Email response body: {response.body}")
-                    print(f"Email response headers: {response.headers}")
-                except Exception as e:
-                    print(f"Error sending email to department: {e}")
-                # Send a copy to the user if they provided their email
-                if email:
-                    try:
-                        user_subject = f"Copy of Your Complaint Registration: {service}"
-                        user_body = f"""
+    await EMAIL_OUTBOX.enqueue(complaint_id, "department", recipient_email, subject, body, reply_to=email or None)
+    # Send a copy to the user if they provided their email
+    if email:
+        user_subject = f"Copy of Your Complaint Registration: {service}"
+        user_body = f"""
 Dear {name},
 
 Thank you for registering your complaint regarding: {service}.
@@ -202,19 +290,7 @@ We have forwarded your complaint to the respective department. You will be conta
 Best regards,
 Kerala Services Bot
 """
-                        user_mail = Mail(from_email, To(email), user_subject, Content("text/plain", user_body))
-                        print(f"Attempting to send copy to user at: {email}")
-                        sg.send(user_mail)
-                        print(f"Copy sent to user at {email}")
-                    except Exception as user_email_err:
-                        print(f"Failed to send copy to user: {user_email_err}")
-            except Exception as email_err:
-                print(f"Failed to send email: {email_err}")
-                # Optionally, log this error somewhere
-
-        return {"success": True, "message": "Complaint registered successfully.", "complaint_id": complaint_id}
-    except Exception as e:
-        return {"success": False, "message": f"Error: {str(e)}"}
+        await EMAIL_OUTBOX.enqueue(complaint_id, "user", email, user_subject, user_body)
 
 @app.post("/track_complaint")
 async def track_complaint(request: Request):
@@ -229,10 +305,21 @@ async def track_complaint(request: Request):
             except Exception:
                 return {"success": False, "message": "Invalid complaint ID format."}
         elif contact:
+            if data.get("all"):
+                # Every complaint for this contact, newest first, one page at a time
+                page = int(data.get("page", 1))
+                complaints, has_more = await database.find_complaints_by_contact(
+                    contact, page=page, page_size=int(data.get("page_size", 10))
+                )
+                if not complaints:
+                    return {"success": False, "message": "Complaint not found."}
+                for complaint in complaints:
+                    complaint["_id"] = str(complaint["_id"])
+                return {"success": True, "complaints": complaints, "page": page, "has_more": has_more}
             query = {"contact": contact}
         else:
             return {"success": False, "message": "Provide complaint ID or contact info."}
-        complaint = complaints_collection.find_one(query)
+        complaint = await database.find_complaint(query)
         if complaint:
             complaint["_id"] = str(complaint["_id"])
             return {"success": True, "complaint": complaint}
@@ -244,100 +331,153 @@ async def track_complaint(request: Request):
 @app.post("/ask")
 async def ask_bot(request: Request):
     try:
+        started = time.perf_counter()
         data = await request.json()
         message = data.get("message", "").lower()
         is_web = request.headers.get("x-frontend", "").lower() == "web"
+        # Web clients that accept an event stream get the reply token by token
+        is_sse = is_web and "text/event-stream" in request.headers.get("accept", "")
 
         if not message:
-            if is_web:
-                return {"reply": "Message cannot be empty."}
-            def error_stream():
-                yield "Message cannot be empty."
-            return StreamingResponse(error_stream(), media_type="text/plain")
-
-        if any(greet in message for greet in GREETINGS):
-            if is_web:
-                return {"reply": "Hello! Please ask about a government service."}
-            def greet_stream():
-                yield "Hello! Please ask about a government service."
-            return StreamingResponse(greet_stream(), media_type="text/plain")
-
-        if not any(keyword in message for keyword in GOV_KEYWORDS):
-            if is_web:
-                return {"reply": "Sorry, I can only help with government services. Please ask about a government service."}
-            def keyword_stream():
-                yield "Sorry, I can only help with government services. Please ask about a government service."
-            return StreamingResponse(keyword_stream(), media_type="text/plain")
-
-        service_info = find_service_info(message)
-        context = ""
-        if service_info:
-            context = f"Service: {service_info['service_name']}\nDescription: {service_info['description']}\nDepartment: {service_info['department']}\nProcessing Time: {service_info['processing_time']}\nRequired Documents: {service_info['required_documents']}\nFees: {service_info['fees']}\nContact Info: {service_info['contact_info']}\nLinks: {service_info['relevant_links']}\nHow to Apply: {service_info['how_to_apply']}\nOfficial Portal: {service_info['official_portal']}"
-
-        # ollama_url = "http://localhost:11434/api/chat"
-        if context:
-            system_prompt = (
-                "You are a helpful assistant for government services in Kerala, India. "
-                "Use the following official service data to answer the user's question. "
-                "If the answer is not in the data, you may use your own knowledge. "
-                "If you use your own knowledge, mention this clearly in your answer (e.g., 'Based on my general knowledge...'). "
-                "Format your answer using Markdown for headings, bold, and bullet points where appropriate. Do not use triple hashes (###) for headings; use single or double # for headings instead.\n"
-                + context
-            )
-        else:
-            system_prompt = (
-                "You are a helpful assistant for government services in Kerala, India. "
-                "If you know the answer about Kerala government services, answer it. "
-                "If the user asks about services outside Kerala, politely refuse or redirect them to Kerala-specific information. For any other topic, politely refuse. "
-                "If you use your own knowledge, mention this clearly in your answer (e.g., 'Based on my general knowledge...'). "
-                "Format your answer using Markdown for headings, bold, and bullet points where appropriate. Do not use triple hashes (###) for headings; use single or double # for headings instead."
-            )
-        # payload = {
-        #     "model": "qwen:1.8b",
-        #     "messages": [
-        #         {"role": "system", "content": system_prompt},
-        #         {"role": "user", "content": message}
-        #     ]
-        # }
-
-        # Gemini API integration
-        gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not gemini_api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
-        genai.configure(api_key=gemini_api_key)
-        model = genai.GenerativeModel('models/gemini-2.5-pro')
-        prompt = system_prompt + "\nUser: " + message
-
-        def stream_gemini():
+            return fixed_reply("Message cannot be empty.", is_web, is_sse)
+
+        catalog = CATALOG.current
+        # Malayalam and Manglish phrases are matched in catalog English; the LLM still gets the original
+        query = catalog.normalizer.normalize(message)
+        intent = catalog.intents.classify(query).intent
+
+        if intent == "greeting":
+            return fixed_reply("Hello! Please ask about a government service.", is_web, is_sse)
+
+        if intent != "gov":
+            return fixed_reply("Sorry, I can only help with government services. Please ask about a government service.", is_web, is_sse)
+
+        # Close runners-up are passed to the prompt too, so ambiguous questions see every candidate
+        matches = catalog.services.search(query, limit=MAX_ROWS)
+        service_info = matches[0][0] if matches else None
+        service_name = service_info['service_name'] if service_info else ""
+        meta = {"service": service_name or None, "cache_hit": False, "served_by": "llm"}
+        fast_reply = FAST_ANSWERS.answer(query, matches, message) if FAST_ANSWERS is not None else None
+        if fast_reply:
+            meta["served_by"] = "fast_path"
+            return fixed_reply(fast_reply, is_web, is_sse, meta, served_by="fast_path")
+        cache_key = ResponseCache.make_key(message, service_name)
+        # Paraphrases only share an answer when they ask the same thing about the same service
+        facets = detect_facets(query)
+        cached_reply = await lookup_cached_reply(cache_key, query, service_name, facets)
+        if cached_reply:
+            meta["cache_hit"] = True
+            meta["served_by"] = "cache"
+            return fixed_reply(cached_reply, is_web, is_sse, meta, served_by="cache")
+
+        # Only the columns the question is about, within the prompt token budget
+        context = build_context(query, matches)
+
+        system_prompt = GROUNDED_INSTRUCTION if context else GENERAL_INSTRUCTION
+
+        generation_id, cancel_event = GENERATIONS.start(data.get("generation_id"))
+        headers = {"X-Generation-Id": generation_id, "X-Served-By": "llm"}
+
+        async def stream_llm(tick=1.0):
+            # Grounded questions may be answered by the local model; Gemini is the fallback.
+            # The LLM stream is closed as soon as the client disconnects or cancels the generation.
+            chunks = LLM_ROUTER.stream(system_prompt, message, has_context=bool(service_info), meta=meta, context=context)
             try:
-                response = model.generate_content(prompt, stream=True)
-                for chunk in response:
-                    # Handle multi-part responses
-                    if hasattr(chunk, 'parts') and chunk.parts:
-                        for part in chunk.parts:
-                            if hasattr(part, 'text') and part.text:
-                                yield part.text
-                    elif hasattr(chunk, 'text') and chunk.text:
-                        yield chunk.text
-            except Exception as e:
-                yield f"[ERROR] {e}"
+                async for chunk in watch_stream(request, chunks, cancel_event, tick=tick):
+                    yield chunk
+            finally:
+                GENERATIONS.finish(generation_id, cancel_event)
+
+        # A client that disconnects before the body starts never runs stream_llm, so the
+        # streaming responses also unregister the generation once they are done
+        finish_generation = BackgroundTask(GENERATIONS.finish, generation_id, cancel_event)
+
+        async def cache_completed_reply(full_reply):
+            if full_reply and "[ERROR]" not in full_reply and not cancel_event.is_set():
+                await store_reply(cache_key, query, service_name, facets, full_reply)
 
-        if is_web:
+        if is_sse:
+            return StreamingResponse(
+                sse_stream(stream_llm(HEARTBEAT_SECONDS), meta, started, cancel_event, on_complete=cache_completed_reply),
+                media_type="text/event-stream",
+                headers={**SSE_HEADERS, **headers},
+                background=finish_generation,
+            )
+        elif is_web:
             # For web, collect full reply as before
-            full_reply = ""
-            for chunk in stream_gemini():
-                full_reply += chunk
+            chunks = []
+            async for chunk in stream_llm():
+                if chunk is not None:
+                    chunks.append(chunk)
+            full_reply = "".join(chunks)
             if not full_reply:
                 full_reply = "Sorry, I couldn't get a response from Gemini."
-            return {"reply": full_reply}
+            else:
+                await cache_completed_reply(full_reply)
+            return JSONResponse({"reply": full_reply, "served_by": "llm"}, headers=headers)
         else:
-            # For Telegram, stream the reply
-            return StreamingResponse(stream_gemini(), media_type="text/plain")
+            # For Telegram, stream the reply and cache it once it completes cleanly
+            async def stream_and_cache():
+                chunks = []
+                async for chunk in stream_llm():
+                    if chunk is not None:
+                        chunks.append(chunk)
+                        yield chunk
+                await cache_completed_reply("".join(chunks))
+            return StreamingResponse(stream_and_cache(), media_type="text/plain", headers=headers,
+                                     background=finish_generation)
 
     except Exception as e:
         print(f"[ERROR] {e}")
-        if request.headers.get("x-frontend", "").lower() == "web":
-            return {"reply": "Something went wrong while talking to the LLM."}
-        def error_stream():
-            yield "Something went wrong while talking to the LLM."
-        return StreamingResponse(error_stream(), media_type="text/plain")
+        is_web = request.headers.get("x-frontend", "").lower() == "web"
+        is_sse = is_web and "text/event-stream" in request.headers.get("accept", "")
+        return fixed_reply("Something went wrong while talking to the LLM.", is_web, is_sse)
+
+@app.post("/ask/cancel")
+async def cancel_generation(request: Request):
+    """Stop a running /ask generation by the id it was started with"""
+    try:
+        data = await request.json()
+        generation_id = data.get("generation_id")
+        if not generation_id:
+            return {"success": False, "message": "generation_id is required."}
+        if GENERATIONS.cancel(generation_id):
+            return {"success": True, "message": "Generation cancelled."}
+        return {"success": False, "message": "No active generation with that ID."}
+    except Exception as e:
+        return {"success": False, "message": f"Error: {str(e)}"}
+
+@app.post("/admin/reload_catalog")
+async def reload_catalog(request: Request):
+    """Reload the service CSV and swap it in; requests already running finish on the old catalog"""
+    if not ADMIN_TOKEN or request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    changed, error = await CATALOG.reload()
+    if error:
+        return {"success": False, "message": f"Catalog not reloaded: {error}", **CATALOG.stats()}
+    return {"success": True, "changed": changed, **CATALOG.stats()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "llm": LLM_ROUTER.stats(),
+        "generations": GENERATIONS.stats(),
+        "answer_cache": ANSWER_CACHE.stats(),
+        "semantic_cache": SEMANTIC_CACHE.stats() if SEMANTIC_CACHE is not None else None,
+        "fast_path": FAST_ANSWERS.stats() if FAST_ANSWERS is not None else None,
+        "email_outbox": EMAIL_OUTBOX.stats() if EMAIL_OUTBOX is not None else None,
+        "catalog": CATALOG.stats(),
+    }
+
+@app.get("/health/llm")
+async def llm_health():
+    """Probe Gemini with a cheap call and report how long it took"""
+    ok = await LLM_CLIENT.warmup()
+    return {"status": "healthy" if ok else "unhealthy", **LLM_CLIENT.health(), "context_cache": GEMINI_CONTEXT.stats()}
+
+@app.get("/health/db")
+async def db_health():
+    """Ping MongoDB and report how long it took"""
+    start = time.perf_counter()
+    ok = await database.ping()
+    return {"status": "healthy" if ok else "unhealthy", "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
@@ -0,0 +1,63 @@
+from telegram_format import TELEGRAM_LIMIT, find_split, utf16_len
+
+
+class MessageChain:
+    """The Telegram messages that one streamed reply is spread over.
+
+    Previews go to the last message only. When the text no longer fits, that
+    message is frozen at a paragraph, line or word break and the rest
+    continues in a new message, so edits never exceed Telegram's limit.
+    `send(text, parse_mode)` returns the new message or None, `edit(message,
+    text, parse_mode, final)` changes one, and `delete(message)` removes one.
+    """
+
+    def __init__(self, send, edit, delete, limit=TELEGRAM_LIMIT):
+        self.send = send
+        self.edit = edit
+        self.delete = delete
+        self.limit = limit
+        self.messages = []
+        # Start of the last message's text within the preview
+        self.offset = 0
+
+    @property
+    def message_ids(self):
+        return [message.message_id for message in self.messages]
+
+    async def start(self, text="..."):
+        """Send the placeholder message; returns False if it couldn't be sent"""
+        message = await self.send(text, None)
+        if message is None:
+            return False
+        self.messages.append(message)
+        return True
+
+    async def update(self, preview):
+        """Show the reply so far, rolling over to a new message when it gets too long"""
+        live = preview[self.offset:]
+        while utf16_len(live) > self.limit:
+            cut = find_split(live, self.limit)
+            await self.edit(self.messages[-1], live[:cut].strip(), None, True)
+            rest = live[cut:].strip()
+            message = await self.send(rest if utf16_len(rest) <= self.limit else "...", None)
+            if message is None:
+                return False
+            self.messages.append(message)
+            self.offset += cut
+            live = preview[self.offset:]
+        await self.edit(self.messages[-1], live.strip(), None, False)
+        return True
+
+    async def finish(self, parts, parse_mode='HTML'):
+        """Replace the previews with the formatted reply, one part per message"""
+        for i, part in enumerate(parts):
+            if i < len(self.messages):
+                await self.edit(self.messages[i], part, parse_mode, True)
+            else:
+                message = await self.send(part, parse_mode)
+                if message is not None:
+                    self.messages.append(message)
+        # Formatting usually shortens the text, which can leave a preview message spare
+        for message in self.messages[len(parts):]:
+            await self.delete(message)
+        del self.messages[max(len(parts), 1):]
@@ -0,0 +1,123 @@
+import os
+import re
+
+# Rough size of a Gemini token in characters, good enough for budgeting English text
+CHARS_PER_TOKEN = 4
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 600))
+# Other matched rows are included when they score within this many points of the best one
+CLOSE_SCORE = 5
+MAX_ROWS = 3
+
+# Instructions for questions with and without matched service data; they are the same
+# for every request, so they can be cached on Gemini's side together with the catalog
+GROUNDED_INSTRUCTION = (
+    "You are a helpful assistant for government services in Kerala, India. "
+    "Use the following official service data to answer the user's question. "
+    "If the answer is not in the data, you may use your own knowledge. "
+    "If you use your own knowledge, mention this clearly in your answer (e.g., 'Based on my general knowledge...'). "
+    "Format your answer using Markdown for headings, bold, and bullet points where appropriate. Do not use triple hashes (###) for headings; use single or double # for headings instead."
+)
+GENERAL_INSTRUCTION = (
+    "You are a helpful assistant for government services in Kerala, India. "
+    "If you know the answer about Kerala government services, answer it. "
+    "If the user asks about services outside Kerala, politely refuse or redirect them to Kerala-specific information. For any other topic, politely refuse. "
+    "If you use your own knowledge, mention this clearly in your answer (e.g., 'Based on my general knowledge...'). "
+    "Format your answer using Markdown for headings, bold, and bullet points where appropriate. Do not use triple hashes (###) for headings; use single or double # for headings instead."
+)
+
+# CSV column -> label used in the prompt
+FIELD_LABELS = {
+    "service_name": "Service",
+    "description": "Description",
+    "department": "Department",
+    "processing_time": "Processing Time",
+    "required_documents": "Required Documents",
+    "fees": "Fees",
+    "contact_info": "Contact Info",
+    "relevant_links": "Links",
+    "how_to_apply": "How to Apply",
+    "official_portal": "Official Portal",
+}
+
+# What a question can be about, the words that give it away and the columns that answer it.
+# Phrases match whole words only; generic words ("number", "time", "pay") appear only inside
+# longer cues, since alone they are just as often part of a service name ("survey number").
+FACET_KEYWORDS = {
+    "fees": ["fee", "cost", "charge", "price", "amount", "how much", "rupees", "how much to pay", "amount to pay",
+             "is it free", "free of cost"],
+    "documents": ["document", "documents needed", "papers", "proof", "required", "requirements", "upload", "id proof"],
+    "processing_time": ["how long", "processing time", "how much time", "time taken", "time does it take", "days",
+                        "processing", "duration", "when will", "how soon", "takes"],
+    "how_to_apply": ["apply", "how to", "procedure", "process", "steps", "online", "portal", "website", "link",
+                     "where", "register"],
+    "contact": ["contact", "phone", "phone number", "mobile number", "helpline", "toll free", "customer care",
+                "email", "call", "office", "office address", "complain"],
+}
+FACET_FIELDS = {
+    "fees": ["fees"],
+    "documents": ["required_documents"],
+    "processing_time": ["processing_time"],
+    "how_to_apply": ["how_to_apply", "official_portal", "relevant_links"],
+    "contact": ["contact_info", "department"],
+}
+
+_phrases = sorted({(phrase, facet) for facet, words in FACET_KEYWORDS.items() for phrase in words},
+                  key=lambda item: -len(item[0]))
+_PHRASE_FACET = {phrase: facet for phrase, facet in _phrases}
+FACET_PATTERN = re.compile(r'(?<!\w)(' + '|'.join(re.escape(phrase) for phrase, _ in _phrases) + r')s?(?!\w)')
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def detect_facets(message):
+    """Return the facets a question asks about, in FACET_KEYWORDS order; empty for a general question"""
+    found = {_PHRASE_FACET[match] for match in FACET_PATTERN.findall(message.lower())}
+    return [facet for facet in FACET_KEYWORDS if facet in found]
+
+
+def fields_for(facets):
+    """Columns to show for the detected facets; every column when nothing specific was asked"""
+    if not facets:
+        return list(FIELD_LABELS)
+    fields = ["service_name"]
+    for facet in facets:
+        fields.extend(field for field in FACET_FIELDS[facet] if field not in fields)
+    return fields
+
+
+def build_context(message, matches, token_budget=PROMPT_TOKEN_BUDGET, close_score=CLOSE_SCORE, max_rows=MAX_ROWS):
+    """Service data for the system prompt, trimmed to what the question needs.
+
+    `matches` are (row, score) pairs from ServiceCatalog.search, best first.
+    Only the columns for the question's facets are included, and rows
+    scoring close to the best one are added while they fit in
+    `token_budget`, so an ambiguous question sees each candidate service.
+    """
+    if not matches:
+        return ""
+    fields = fields_for(detect_facets(message))
+    best_score = matches[0][1]
+    blocks = []
+    used = 0
+    for row, score in matches[:max_rows]:
+        if best_score - score > close_score:
+            break
+        block = "\n".join(f"{FIELD_LABELS[field]}: {row[field]}" for field in fields if row.get(field))
+        cost = estimate_tokens(block)
+        if blocks and used + cost > token_budget:
+            break
+        if not blocks and cost > token_budget:
+            block = block[:token_budget * CHARS_PER_TOKEN]
+            cost = token_budget
+        blocks.append(block)
+        used += cost
+    return "\n\n".join(blocks)
+
+
+def catalog_text(rows):
+    """Every row with every column, for the cached context that stays the same across requests"""
+    blocks = ["\n".join(f"{label}: {row[field]}" for field, label in FIELD_LABELS.items() if row.get(field))
+              for row in rows]
+    return "Official Kerala government service catalog:\n\n" + "\n\n".join(blocks)
@@ -0,0 +1,152 @@
+import re
+import unicodedata
+
+# Malayalam script, plus the zero-width joiners that appear inside its words
+MALAYALAM = '\u0d00-\u0d7f\u200c\u200d'
+VIRAMA = '\u0d4d'
+ANUSVARA = '\u0d02'
+# Old-style chillus (consonant + virama + ZWJ) and the atomic letters that replaced them
+LEGACY_CHILLUS = {
+    'ണ\u0d4d\u200d': 'ൺ',
+    'ന\u0d4d\u200d': 'ൻ',
+    'ര\u0d4d\u200d': 'ർ',
+    'ല\u0d4d\u200d': 'ൽ',
+    'ള\u0d4d\u200d': 'ൾ',
+    'ക\u0d4d\u200d': 'ൿ',
+}
+CHILLU_PATTERN = re.compile('|'.join(LEGACY_CHILLUS))
+# Case endings typed after transliterated words ("cardinu", "certificatinte")
+MANGLISH_SUFFIXES = ['s', 'nu', 'inu', 'nte', 'inte', 'il', 'ile', 'kku', 'ikku', 'um']
+
+# Malayalam and Manglish words -> the English the catalog and intent keywords are written in.
+# Malayalam entries match inflected forms too ("കാർഡിന്", "രേഖകൾ"), see QueryNormalizer.
+SYNONYMS = {
+    # Certificates and documents
+    "ജനന": "birth", "janana": "birth", "jananam": "birth", "jenana": "birth",
+    "മരണ": "death", "marana": "death", "maranam": "death",
+    "വിവാഹ": "marriage", "vivaha": "marriage", "vivaham": "marriage", "kalyanam": "marriage",
+    "വരുമാന": "income", "varumana": "income", "varumanam": "income",
+    "ജാതി": "caste", "jathi": "caste", "jaathi": "caste",
+    "സർട്ടിഫിക്കറ്റ്": "certificate", "സാക്ഷ്യപത്രം": "certificate",
+    "sertificate": "certificate", "certifikate": "certificate", "sarttificate": "certificate",
+    "sarttifikkattu": "certificate", "certificatu": "certificate",
+    "ഉടമസ്ഥാവകാശ": "ownership", "udamasthavakasha": "ownership",
+    "കാർഡ്": "card", "kard": "card",
+    "റേഷൻ": "ration", "rashan": "ration", "reshan": "ration", "reshan card": "ration card",
+    "ആധാർ": "aadhaar", "adhar": "aadhaar", "aadhar": "aadhaar", "adhaar": "aadhaar",
+    "തിരിച്ചറിയൽ കാർഡ്": "identity card", "thiricharial card": "identity card",
+    "വോട്ടർ": "voter", "vottar": "voter", "otter id": "voter id",
+    "ഐഡി": "id",
+    "പാസ്പോർട്ട്": "passport", "passpot": "passport",
+    "ലൈസൻസ്": "license", "licence": "license", "lisence": "license", "lycense": "license",
+    "ഡ്രൈവിംഗ്": "driving", "ഡ്രൈവിങ്": "driving", "driving licence": "driving license",
+    "dl": "driving license",
+    "ലേണേഴ്സ്": "learner's", "learners": "learner's",
+    "പെൻഷൻ": "pension", "വാർദ്ധക്യ പെൻഷൻ": "old age pension", "vardhakya pension": "old age pension",
+    "വിധവ പെൻഷൻ": "widow pension", "vidhava pension": "widow pension",
+    "സ്കോളർഷിപ്പ്": "scholarship",
+    # Bills and taxes
+    "വൈദ്യുതി": "electricity", "vaidyuthi": "electricity", "vydyuthi": "electricity",
+    "കറന്റ് ബിൽ": "electricity bill", "current bill": "electricity bill", "karant bill": "electricity bill",
+    "വെള്ളക്കരം": "water bill", "vellakkaram": "water bill", "vellakaram": "water bill",
+    "വെള്ളം": "water", "vellam": "water",
+    "ബിൽ": "bill", "ബില്ല്": "bill",
+    "നികുതി": "tax", "nikuthi": "tax",
+    "വസ്തു നികുതി": "property tax", "vasthu nikuthi": "property tax",
+    "കെട്ടിട നികുതി": "property tax", "kettida nikuthi": "property tax", "veettu karam": "property tax",
+    "അടയ്ക്ക": "payment", "adakkan": "payment", "adakkal": "payment", "adakkam": "payment",
+    "ഭൂമി": "land", "bhoomi": "land",
+    # Offices
+    "പഞ്ചായത്ത്": "panchayat", "panchayath": "panchayat",
+    "നഗരസഭ": "municipality", "nagarasabha": "municipality", "muncipality": "municipality",
+    "അക്ഷയ": "akshaya",
+    "വില്ലേജ് ഓഫീസ്": "village office", "village officil": "village office",
+    # What is being asked (prompt_context facets)
+    "തിരുത്ത": "correction", "thiruthal": "correction", "thiruthan": "correction",
+    "പുതുക്ക": "renewal", "puthukkal": "renewal", "puthukkan": "renewal",
+    "അപേക്ഷ": "apply", "apeksha": "apply", "apekshikkam": "apply", "apekshikkan": "apply",
+    "എങ്ങനെ": "how to", "engane": "how to", "enganeya": "how to",
+    "ഫീസ്": "fee", "ചാർജ്": "charge", "ethra rupa": "how much", "എത്ര രൂപ": "how much",
+    "എത്ര ദിവസം": "how long", "ethra divasam": "how long", "ethra naal": "how long",
+    "രേഖ": "documents", "rekha": "documents", "rekhakal": "documents",
+    "ഫോൺ നമ്പർ": "phone number", "ഓഫീസ്": "office", "ബന്ധപ്പെട": "contact",
+    # Greetings
+    "നമസ്കാരം": "hello", "ഹലോ": "hello", "namaskaram": "hello",
+}
+
+
+def _clean(text):
+    """NFC, atomic chillus, lowercase and single spaces, so the same word is always the same string"""
+    text = unicodedata.normalize('NFC', text)
+    if '\u200d' in text:
+        text = CHILLU_PATTERN.sub(lambda m: LEGACY_CHILLUS[m.group(0)], text)
+    return ' '.join(text.replace('\u200c', '').replace('\u200d', '').lower().split())
+
+
+def _stem(phrase):
+    """Malayalam inflects by replacing a final virama or anusvara, so match on the letters before it"""
+    return phrase[:-1] if phrase[-1] in (VIRAMA, ANUSVARA) and len(phrase) > 2 else phrase
+
+
+def _is_malayalam(phrase):
+    return any('\u0d00' <= ch <= '\u0d7f' for ch in phrase)
+
+
+def csv_aliases(rows):
+    """Alternative names for services found in the CSV.
+
+    An `aliases` column, when present, lists them separated by "|". A
+    parenthesised part of a service name, like "(IDP)" or "(Kerala Water
+    Authority)", is also an alias for the rest of the name. Aliases are
+    rewritten to the name without its parenthesised parts ("epic" becomes
+    "voter registration").
+    """
+    aliases = {}
+    for row in rows:
+        name = row.get('service_name', '')
+        outer = _clean(re.sub(r'\([^)]*\)', ' ', name))
+        for inner in re.findall(r'\(([^)]*)\)', name):
+            if outer and inner.strip():
+                aliases[_clean(inner)] = outer
+        for alias in (row.get('aliases') or '').split('|'):
+            if alias.strip() and outer:
+                aliases[_clean(alias)] = outer
+    return aliases
+
+
+class QueryNormalizer:
+    """Rewrite Malayalam and Manglish phrases in a question into catalog English.
+
+    Every dictionary phrase and CSV alias is compiled into one alternation
+    regex, longest first, so a question is rewritten in a single scan
+    before intent classification and service matching. Malayalam phrases
+    match at the start of a word and take the rest of it along, which
+    covers case endings ("കാർഡിന്" is "card"); transliterated phrases
+    allow the common Manglish endings instead.
+    """
+
+    def __init__(self, rows=(), synonyms=SYNONYMS):
+        self.replacements = {}
+        for phrase, english in {**synonyms, **csv_aliases(rows)}.items():
+            phrase = _clean(phrase)
+            if phrase:
+                self.replacements[_stem(phrase) if _is_malayalam(phrase) else phrase] = english
+        malayalam = sorted((p for p in self.replacements if _is_malayalam(p)), key=len, reverse=True)
+        latin = sorted((p for p in self.replacements if not _is_malayalam(p)), key=len, reverse=True)
+        branches = []
+        if malayalam:
+            branches.append('(' + '|'.join(map(re.escape, malayalam)) + f')[{MALAYALAM}]*')
+        if latin:
+            branches.append('(' + '|'.join(map(re.escape, latin)) + ')(?:' + '|'.join(MANGLISH_SUFFIXES) + r')?(?!\w)')
+        self.pattern = re.compile(f'(?<![\\w{MALAYALAM}])(?:' + '|'.join(branches) + ')') if branches else None
+
+    def _replace(self, match):
+        return self.replacements[match.group(1) or match.group(2)]
+
+    def normalize(self, message):
+        """Return the question lowercased with known phrases in catalog English"""
+        message = _clean(message)
+        if self.pattern is None:
+            return message
+        return self.pattern.sub(self._replace, message)
+
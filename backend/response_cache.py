@@ -0,0 +1,128 @@
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+PUNCTUATION = re.compile(r'[^\w\s]')
+# MongoDB's error code for an index that exists with other options, e.g. an older expireAfterSeconds
+INDEX_OPTIONS_CONFLICT = 85
+
+
+def normalize_question(message):
+    """Lowercase, drop punctuation and collapse whitespace so near-identical questions share a key"""
+    return ' '.join(PUNCTUATION.sub(' ', message.lower()).split())
+
+
+class ResponseCache:
+    """Bounded LRU cache of LLM answers with a TTL.
+
+    Entries are keyed on the normalized question plus the service_name that
+    the catalog search resolved. When an async MongoDB collection is set, answers are
+    also written there so they survive restarts; MongoDB expires them with a
+    TTL index on `created_at`. MongoDB's TTL monitor runs only once a minute,
+    so reads also skip documents older than the TTL.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=6 * 3600, collection=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.collection = collection
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def connect(self, collection):
+        """Persist answers in `collection`, creating its TTL index with the current ttl_seconds"""
+        self.collection = collection
+        index = [("created_at", ASCENDING)]
+        try:
+            await collection.create_index(index, expireAfterSeconds=self.ttl_seconds)
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT:
+                print(f"Error creating answer cache index: {e}")
+                return
+            # ANSWER_CACHE_TTL changed since the index was built; update it in place
+            try:
+                await collection.database.command("collMod", collection.name, index={
+                    "keyPattern": {"created_at": 1}, "expireAfterSeconds": self.ttl_seconds})
+            except Exception as e:
+                print(f"Error updating answer cache TTL: {e}")
+        except Exception as e:
+            print(f"Error creating answer cache index: {e}")
+
+    @staticmethod
+    def make_key(message, service_name=""):
+        return f"{normalize_question(message)}|{(service_name or '').lower()}"
+
+    async def get(self, key):
+        """Return the cached reply for the key, or None"""
+        entry = self.entries.get(key)
+        if entry and time.monotonic() - entry[1] < self.ttl_seconds:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if entry:
+            del self.entries[key]
+        reply = await self._load(key) if self.collection is not None else None
+        if reply:
+            self._remember(key, reply)
+            self.hits += 1
+            return reply
+        self.misses += 1
+        return None
+
+    async def set(self, key, reply):
+        if not reply:
+            return
+        self._remember(key, reply)
+        if self.collection is not None:
+            await self._store(key, reply)
+
+    def _remember(self, key, reply):
+        self.entries[key] = (reply, time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def clear(self):
+        """Drop every cached answer, e.g. after the service data they were built from changed"""
+        self.entries.clear()
+        if self.collection is not None:
+            try:
+                await self.collection.delete_many({})
+            except Exception as e:
+                print(f"Error clearing answer cache: {e}")
+
+    async def _load(self, key):
+        try:
+            oldest = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+            doc = await self.collection.find_one({"_id": key, "created_at": {"$gt": oldest}}, {"reply": 1})
+            return doc["reply"] if doc else None
+        except Exception as e:
+            print(f"Error reading answer cache: {e}")
+            return None
+
+    async def _store(self, key, reply):
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {"reply": reply, "created_at": datetime.now(timezone.utc)},
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"Error writing answer cache: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self.collection is not None,
+        }
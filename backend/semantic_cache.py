@@ -0,0 +1,175 @@
+import re
+import zlib
+
+import numpy as np
+
+from prompt_context import FACET_PATTERN
+from response_cache import normalize_question
+from service_catalog import words_match
+
+WORD_PATTERN = re.compile(r'\w+')
+# Function words; paraphrases mostly differ in these, so they are left out of the vectors
+STOPWORDS = frozenset(
+    "a an the is are was what which how can could do does did i my me we our you to for of in on at by from "
+    "with and or please tell about there it this that be will should would get need needed want know take".split()
+)
+# Lowest similarity that counts as the same question; test_semantic_cache.py checks it
+DEFAULT_THRESHOLD = 0.86
+
+
+def _singular(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+class HashingVectorizer:
+    """Deterministic hashed TF-IDF vectorizer for short questions.
+
+    Words, word bigrams and character n-grams are hashed with crc32 into a
+    fixed number of buckets, so no vocabulary needs to be kept and the same
+    text always maps to the same vector across processes. IDF weights are
+    learned from the documents passed to `fit` (the service catalog).
+    """
+
+    def __init__(self, n_features=4096, char_ngrams=(3, 4)):
+        self.n_features = n_features
+        self.char_ngrams = char_ngrams
+        self.idf = np.ones(n_features, dtype=np.float32)
+
+    def features(self, text):
+        # Plurals fold onto the singular so "fee" and "fees" share features
+        words = [_singular(word) for word in WORD_PATTERN.findall(normalize_question(text)) if word not in STOPWORDS]
+        grams = list(words)
+        grams += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f" {word} "
+            for n in self.char_ngrams:
+                grams += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+        return [zlib.crc32(gram.encode('utf-8')) % self.n_features for gram in grams]
+
+    def fit(self, documents):
+        counts = np.zeros(self.n_features, dtype=np.float32)
+        documents = list(documents)
+        for doc in documents:
+            counts[list(set(self.features(doc)))] += 1
+        self.idf = (np.log((1 + len(documents)) / (1 + counts)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, text):
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        buckets = self.features(text)
+        if buckets:
+            np.add.at(vector, buckets, 1.0)
+            vector = np.log1p(vector) * self.idf
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector
+
+
+class SemanticCache:
+    """Answer cache that matches paraphrased questions by cosine similarity.
+
+    Vectors live in one preallocated NumPy matrix. A lookup only compares
+    against questions that resolved to the same service_name and ask about
+    the same facets (prompt_context.detect_facets), so "fees for X" never
+    gets the cached answer to "documents for X" however similar the words
+    are. Since the slot already says that much, only the rest of the
+    question is embedded: "renew my driving license" and "driving license
+    renewal process" both say nothing else and share an answer, while "...
+    for a shop" doesn't match the question without it. The least recently
+    used slot is overwritten once the cache is full. Questions should be
+    passed normalized (QueryNormalizer), so spelling variants embed alike.
+    """
+
+    def __init__(self, vectorizer, capacity=1024, threshold=DEFAULT_THRESHOLD):
+        self.vectorizer = vectorizer
+        self.capacity = capacity
+        self.threshold = threshold
+        self.matrix = np.zeros((capacity, vectorizer.n_features), dtype=np.float32)
+        self.keys = np.full(capacity, "", dtype=object)
+        # Slots whose question said nothing beyond its service and facets
+        self.bare = np.zeros(capacity, dtype=bool)
+        self.replies = [None] * capacity
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _tick(self):
+        self.clock += 1
+        return self.clock
+
+    @staticmethod
+    def slot_key(service_name, facets):
+        # A question naming only the service asks how to get it, like one about applying
+        if list(facets) == ["how_to_apply"]:
+            facets = ()
+        return f"{service_name}|{','.join(facets)}"
+
+    @staticmethod
+    def content(message, service_name):
+        """The words of the question that neither name the service nor ask for a facet"""
+        name_words = WORD_PATTERN.findall(normalize_question(service_name))
+        # The same phrases detect_facets looks for, since the slot key already holds the facets
+        message = FACET_PATTERN.sub(" ", normalize_question(message))
+        return " ".join(
+            word for word in WORD_PATTERN.findall(message)
+            if word not in STOPWORDS and not any(words_match(word, name_word) for name_word in name_words)
+        )
+
+    def lookup(self, message, service_name, facets=()):
+        """Return the reply of the most similar earlier question for the service and facets, or None"""
+        if not service_name or not self.size:
+            self.misses += 1
+            return None
+        slots = np.flatnonzero(self.keys[:self.size] == self.slot_key(service_name, facets))
+        if slots.size:
+            content = self.content(message, service_name)
+            if content:
+                scores = self.matrix[slots] @ self.vectorizer.transform(content)
+            else:
+                scores = self.bare[slots].astype(np.float32)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                slot = slots[best]
+                self.last_used[slot] = self._tick()
+                self.hits += 1
+                return self.replies[slot]
+        self.misses += 1
+        return None
+
+    def add(self, message, service_name, reply, facets=()):
+        if not service_name or not reply:
+            return
+        if self.size < self.capacity:
+            slot = self.size
+            self.size += 1
+        else:
+            slot = int(np.argmin(self.last_used))
+        content = self.content(message, service_name)
+        self.matrix[slot] = self.vectorizer.transform(content) if content else 0.0
+        self.bare[slot] = not content
+        self.keys[slot] = self.slot_key(service_name, facets)
+        self.replies[slot] = reply
+        self.last_used[slot] = self._tick()
+
+    def clear(self, vectorizer=None):
+        """Forget every cached answer, switching to `vectorizer` when the catalog it was fitted on changed"""
+        if vectorizer is not None:
+            self.vectorizer = vectorizer
+        self.keys[:] = ""
+        self.bare[:] = False
+        self.replies = [None] * self.capacity
+        self.last_used[:] = 0
+        self.size = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": self.size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+        }
+
@@ -0,0 +1,131 @@
+import re
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Words that appear in many service names but say nothing about the service itself
+SERVICE_STOPWORDS = re.compile(r'\b(application|registration|download|get|apply|for|the|a|an|of)\b')
+TOKEN_PATTERN = re.compile(r'\w+')
+# A parenthesised part of a name, like "(IDP)", is another name for the service
+PARENTHESISED = re.compile(r'\([^)]*\)')
+APOSTROPHES = re.compile(r"['’]")
+
+# Minimum fuzzy score for a row to count as a match
+MATCH_THRESHOLD = 80
+# Share of a name's character trigrams that must appear in the message for the row to be scored
+TRIGRAM_OVERLAP = 0.4
+
+
+def normalize_service_name(name):
+    """Lowercase a service name and drop the generic words around it"""
+    name = SERVICE_STOPWORDS.sub('', name.lower())
+    return ' '.join(name.split())
+
+
+def word_similarity(word, other):
+    """0-100; 100 when the words are equal or one extends the other ("renew", "renewal")"""
+    if word == other:
+        return 100.0
+    if min(len(word), len(other)) >= 4 and (word.startswith(other) or other.startswith(word)):
+        return 100.0
+    return fuzz.ratio(word, other)
+
+
+def words_match(word, other):
+    """Whether two words are the same word, allowing for endings and typos"""
+    return word_similarity(word, other) >= MATCH_THRESHOLD
+
+
+def char_ngrams(text, n=3):
+    return {text[i:i + n] for i in range(max(len(text) - n + 1, 1))}
+
+
+class ServiceCatalog:
+    """Search index over the service rows, built once when the CSV is loaded.
+
+    Rows are first narrowed down with a token inverted index and a character
+    trigram index, and only those candidates are scored with a single batched
+    rapidfuzz pass. A name scores the better of partial_ratio and
+    token_set_ratio. Against a longer question that score is scaled down by
+    the share of the name's words missing from it, so "new driving license"
+    found inside "renew driving license" doesn't count as a match, and a
+    question holding every word of the name scores by how well those words
+    match, however many other words it has. `normalize`, when given, is
+    applied to each name first, so names are spelled the way normalized
+    questions are.
+    """
+
+    def __init__(self, rows, normalize=None):
+        self.rows = list(rows)
+        self.names = []
+        self.name_trigrams = []
+        self.name_words = []
+        self.token_index = defaultdict(set)
+        self.trigram_index = defaultdict(set)
+        for idx, row in enumerate(self.rows):
+            name = row.get('service_name', '')
+            name = normalize_service_name(normalize(name) if normalize else name)
+            self.names.append(name)
+            self.name_words.append(self.required_words(name))
+            trigrams = char_ngrams(name) if name else set()
+            self.name_trigrams.append(trigrams)
+            for token in TOKEN_PATTERN.findall(name):
+                self.token_index[token].add(idx)
+            for gram in trigrams:
+                self.trigram_index[gram].add(idx)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def required_words(name):
+        """Words of a normalized name a longer question has to contain to match it"""
+        name = APOSTROPHES.sub('', name)
+        words = TOKEN_PATTERN.findall(PARENTHESISED.sub(' ', name))
+        # The parenthesised alias can be left out unless the rest of the name is a single word
+        return words if len(words) > 1 else TOKEN_PATTERN.findall(name)
+
+    def candidates(self, message):
+        """Return indexes of rows worth scoring against the message"""
+        found = set()
+        for token in TOKEN_PATTERN.findall(message):
+            found |= self.token_index.get(token, set())
+        overlap = defaultdict(int)
+        for gram in char_ngrams(message):
+            for idx in self.trigram_index.get(gram, ()):
+                overlap[idx] += 1
+        for idx, count in overlap.items():
+            if count >= TRIGRAM_OVERLAP * len(self.name_trigrams[idx]):
+                found.add(idx)
+        return sorted(found)
+
+    def search(self, message, limit=5, score_cutoff=MATCH_THRESHOLD):
+        """Return up to `limit` (row, score) pairs scoring above the cutoff, best first"""
+        message = message.lower()
+        indexes = [idx for idx in self.candidates(message) if self.names[idx]]
+        if not indexes:
+            return []
+        names = [self.names[idx] for idx in indexes]
+        partial = process.cdist([message], names, scorer=fuzz.partial_ratio)[0]
+        token_set = process.cdist([message], names, scorer=fuzz.token_set_ratio)[0]
+        words = set(TOKEN_PATTERN.findall(message))
+        scored = []
+        for idx, name, score in zip(indexes, names, map(float, np.maximum(partial, token_set))):
+            # A question longer than the name should contain each of its words, not just its letters
+            if len(name) <= len(message):
+                name_words = self.name_words[idx]
+                if name_words:
+                    best = [100.0 if word in words else max(word_similarity(word, other) for other in words)
+                            for word in name_words]
+                    covered = [similarity for similarity in best if similarity >= MATCH_THRESHOLD]
+                    score = max(score * len(covered) / len(name_words), sum(covered) / len(name_words))
+            if score > score_cutoff:
+                scored.append((score, idx))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(self.rows[idx], score) for score, idx in scored[:limit]]
+
+    def find(self, message):
+        """Return the best matching row, or None when nothing scores high enough"""
+        matches = self.search(message, limit=1)
+        return matches[0][0] if matches else None
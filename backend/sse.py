@@ -0,0 +1,47 @@
+import json
+import time
+
+# Send a comment line when nothing else was sent for this long, so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event; data is JSON so newlines in the reply survive"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def sse_replay(text, meta):
+    """Send a ready-made reply as a single chunk followed by its metadata"""
+    yield sse_event("chunk", {"text": text})
+    yield sse_event("meta", meta)
+
+
+async def sse_stream(chunks, meta, started, cancel_event, on_complete=None):
+    """Relay reply chunks as SSE `chunk` events and finish with a `meta` event.
+
+    `chunks` comes from generations.watch_stream, which yields None whenever
+    the upstream is quiet; each None becomes a keepalive comment. A cancelled
+    generation ends without a `meta` event and `on_complete` only gets the
+    full reply when the stream ran to the end. `started` is the
+    perf_counter() value that the timings are measured from.
+    """
+    parts = []
+    first_token_ms = None
+    async for chunk in chunks:
+        if chunk is None:
+            yield ": keepalive\n\n"
+            continue
+        if first_token_ms is None:
+            first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+        parts.append(chunk)
+        yield sse_event("chunk", {"text": chunk})
+    if cancel_event.is_set():
+        return
+    meta["timings"] = {
+        "first_token_ms": first_token_ms,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    yield sse_event("meta", meta)
+    if on_complete is not None:
+        await on_complete("".join(parts))
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value, expires_at):
+        self.value = value
+        self.expires_at = expires_at
+
+
+class StateStore:
+    """Dict-like per-user state for the bots, bounded by age and size.
+
+    Entries expire `ttl` seconds after they were last set, and the oldest
+    entry is dropped once there are more than `max_entries`. Every
+    `sweep_interval` seconds a write also sweeps out expired entries and
+    finished asyncio tasks, so users who wrote once don't stay in memory.
+
+    With a `shared` backend (see MongoStateBackend) writes are mirrored to it
+    and `load()` pulls a key written by another replica, so several webhook
+    instances can agree on per-chat rate limits and active generations.
+    """
+
+    def __init__(self, name, ttl, max_entries=10000, sweep_interval=60, shared=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.shared = shared
+        self.entries = OrderedDict()
+        self.pending_writes = set()
+        self.last_sweep = time.monotonic()
+        self.evicted = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        if entry.expires_at <= time.monotonic():
+            del self.entries[key]
+            self.evicted += 1
+            return default
+        return entry.value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._set_local(key, value)
+        self._mirror(self.shared.set(self.name, key, value, self.ttl) if self.shared else None)
+
+    def __delitem__(self, key):
+        del self.entries[key]
+        self._mirror(self.shared.delete(self.name, key) if self.shared else None)
+
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        del self[key]
+        return value
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _set_local(self, key, value):
+        now = time.monotonic()
+        self.entries[key] = _Entry(value, now + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+        if now - self.last_sweep > self.sweep_interval:
+            self.sweep(now)
+
+    def _mirror(self, write):
+        """Run a write to the shared backend in the background"""
+        if write is None:
+            return
+        task = asyncio.ensure_future(write)
+        self.pending_writes.add(task)
+        task.add_done_callback(self.pending_writes.discard)
+
+    async def load(self, key):
+        """Refresh one key from the shared backend before reading it"""
+        if self.shared is None:
+            return
+        try:
+            value = await self.shared.get(self.name, key)
+        except Exception as e:
+            print(f"Error loading shared state {self.name}: {e}")
+            return
+        if value is not None:
+            self._set_local(key, value)
+
+    def sweep(self, now=None):
+        """Drop expired entries and finished tasks"""
+        now = time.monotonic() if now is None else now
+        self.last_sweep = now
+        stale = [key for key, entry in self.entries.items()
+                 if entry.expires_at <= now or (isinstance(entry.value, asyncio.Future) and entry.value.done())]
+        for key in stale:
+            del self.entries[key]
+        self.evicted += len(stale)
+        return len(stale)
+
+    def stats(self):
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "evicted": self.evicted,
+                "shared": self.shared is not None}
+
+
+class MongoStateBackend:
+    """Bot state shared between replicas in one MongoDB collection.
+
+    Documents are keyed by store name and key and carry an `expires_at`
+    date with a TTL index, so MongoDB removes them once they expire.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, name, key):
+        doc = await self.collection.find_one({"_id": f"{name}:{key}"})
+        if doc is None or doc["expires_at"] <= datetime.utcnow():
+            return None
+        return doc["value"]
+
+    async def set(self, name, key, value, ttl):
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        await self.collection.update_one({"_id": f"{name}:{key}"},
+                                         {"$set": {"value": value, "expires_at": expires_at}}, upsert=True)
+
+    async def delete(self, name, key):
+        await self.collection.delete_one({"_id": f"{name}:{key}"})
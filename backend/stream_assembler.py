@@ -0,0 +1,60 @@
+import re
+
+# Characters that may end a visible preview without cutting a word in half
+BOUNDARY = re.compile(r'\s')
+
+
+class StreamAssembler:
+    """Collects streamed reply chunks and hands out text snapshots for message edits.
+
+    Chunks are appended to a list as they arrive and joined only when a
+    snapshot is actually needed, so a long reply is no longer rebuilt with
+    string `+=` on every token. Chunks are kept exactly as the backend sent
+    them, so whitespace survives and a word split across two chunks is not
+    glued together with a stray space.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+        self.snapshot_length = 0
+        self.last_snapshot = ""
+
+    def feed(self, chunk):
+        if chunk:
+            self.parts.append(chunk)
+            self.length += len(chunk)
+
+    def text(self):
+        """The full reply received so far"""
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+    def pending_chars(self):
+        """Characters received since the last snapshot"""
+        return self.length - self.snapshot_length
+
+    def snapshot(self):
+        """Return the preview to show now, or None if it wouldn't change the message.
+
+        The preview stops at the last whitespace so a word that is still
+        streaming isn't shown half-written.
+        """
+        text = self.text()
+        end = len(text)
+        if end and not BOUNDARY.match(text[-1]):
+            last_space = max(text.rfind(' '), text.rfind('\n'))
+            if last_space > 0:
+                end = last_space
+        preview = text[:end].strip().replace('###', '')
+        self.snapshot_length = self.length
+        if not preview or preview == self.last_snapshot:
+            return None
+        self.last_snapshot = preview
+        return preview
+
+    def final(self):
+        """The complete reply, once the stream has ended"""
+        return self.text().strip()
+
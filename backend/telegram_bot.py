@@ -2,66 +2,74 @@ import requests
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, ContextTypes, filters
 import asyncio
-import httpx
 import time
-from telegram.error import RetryAfter, NetworkError
-import re
+from telegram.error import NetworkError
 import os
+import uuid
 from dotenv import load_dotenv
+from backend_client import create_backend_client
+from stream_assembler import StreamAssembler
+from edit_cadence import EditCadence
+from telegram_format import format_telegram
+from message_chain import MessageChain
+from telegram_scheduler import TelegramScheduler
+from state_store import StateStore
 
 load_dotenv()
 
 # Track running tasks per user
-user_tasks = {}
+user_tasks = StateStore("tasks", ttl=600)
 # Track last message time per user to implement rate limiting
-user_last_message = {}
+user_last_message = StateStore("last_message", ttl=60)
+# Track the backend generation id per user so /stop can cancel it server-side
+user_generations = StateStore("generations", ttl=600)
+# Keep references to fire-and-forget tasks until they finish
+background_tasks = set()
+# Pooled client for backend calls, opened on startup and closed on shutdown
+http_client = None
+# Every send and edit goes through one scheduler that enforces Telegram's rate limits
+TELEGRAM_SCHEDULER = TelegramScheduler()
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 if not TELEGRAM_TOKEN:
     raise ValueError("TELEGRAM_TOKEN environment variable is required")
 BACKEND_URL = "https://zenturiochatbot.onrender.com/ask"
+CANCEL_URL = BACKEND_URL.rstrip('/') + "/cancel"
 
 # Rate limiting: minimum seconds between messages per user
 RATE_LIMIT_SECONDS = 2
 
-async def safe_send_message(update: Update, text: str, max_retries=3):
-    """Safely send a message with retry logic and rate limiting"""
+async def safe_send_message(update: Update, text: str, max_retries=3, parse_mode='Markdown'):
+    """Safely send a message through the shared rate-limit scheduler"""
     text = text.replace('###', '')
     user_id = update.effective_user.id
-    current_time = time.time()
-    
-    # Check rate limiting
+
+    # Keep at least RATE_LIMIT_SECONDS between messages to the same user
+    not_before = 0.0
     if user_id in user_last_message:
-        time_since_last = current_time - user_last_message[user_id]
-        if time_since_last < RATE_LIMIT_SECONDS:
-            await asyncio.sleep(RATE_LIMIT_SECONDS - time_since_last)
-    
-    # Try to send message with exponential backoff
-    for attempt in range(max_retries):
-        try:
-            message = await update.message.reply_text(text, parse_mode='Markdown')
-            user_last_message[user_id] = time.time()
-            return message
-        except RetryAfter as e:
-            if attempt < max_retries - 1:
-                # Use Telegram's suggested retry time, but cap it at a reasonable maximum
-                wait_time = min(e.retry_after + (attempt * 5), 120)  # Max 2 minutes
-                print(f"Rate limited, waiting {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
-            else:
-                print(f"Failed to send message after {max_retries} attempts")
-                return None
-        except Exception as e:
-            print(f"Error sending message: {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(1)
-            else:
-                return None
+        not_before = time.monotonic() + user_last_message[user_id] + RATE_LIMIT_SECONDS - time.time()
+
+    message = await TELEGRAM_SCHEDULER.send(
+        update.effective_chat.id,
+        lambda: update.message.reply_text(text, parse_mode=parse_mode),
+        max_retries=max_retries,
+        not_before=not_before,
+    )
+    if message is None:
+        print(f"Failed to send message after {max_retries} attempts")
+        return None
+    user_last_message[user_id] = time.time()
+    return message
 
 # Update safe_edit_message to accept parse_mode argument
 default_parse_mode = None
-async def safe_edit_message(message, text: str, max_retries=3, parse_mode=default_parse_mode):
-    """Safely edit a message with retry logic"""
+async def safe_edit_message(message, text: str, max_retries=3, parse_mode=default_parse_mode, final=False):
+    """Safely edit a message through the shared rate-limit scheduler.
+
+    Intermediate edits are queued and return right away; a newer edit of the
+    same message replaces one that hasn't gone out yet. Final edits jump
+    ahead of intermediate ones and are waited for.
+    """
     text = text.replace('###', '')
     # Check if content is actually different to avoid "Message is not modified" error
     try:
@@ -69,69 +77,45 @@ async def safe_edit_message(message, text: str, max_retries=3, parse_mode=defaul
             return True  # No need to edit if content is the same
     except:
         pass  # If we can't check current text, proceed with edit
-    
-    for attempt in range(max_retries):
-        try:
-            if parse_mode:
-                await message.edit_text(text, parse_mode=parse_mode)
-            else:
-                await message.edit_text(text)
-            return True
-        except RetryAfter as e:
-            if attempt < max_retries - 1:
-                # Use Telegram's suggested retry time, but cap it at a reasonable maximum
-                wait_time = min(e.retry_after + (attempt * 5), 120)  # Max 2 minutes
-                print(f"Rate limited during edit, waiting {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
-            else:
-                print(f"Failed to edit message after {max_retries} attempts")
-                return False
-        except Exception as e:
-            # Don't log "Message is not modified" errors as they're harmless
-            if "Message is not modified" not in str(e):
-                print(f"Error editing message: {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(1)
-            else:
-                return False
-
-def sanitize_markdown(text):
-    # Remove unmatched single asterisks and underscores
-    text = re.sub(r'(?<!\*)\*(?!\*)', '', text)  # Remove single *
-    text = re.sub(r'(?<!_)_(?!_)', '', text)        # Remove single _
-    # Remove incomplete links (unclosed [ or () )
-    text = re.sub(r'\[([^\]]*)\]\(([^\)]*)$', r'\1 (\2)', text)
-    # Optionally, remove stray backticks
-    text = re.sub(r'`+', '', text)
-    return text
-
-def format_for_telegram(text):
-    # Headings: convert lines starting with # or ## to bold
-    text = re.sub(r'^#+\s*(.+)$', r'*\1*', text, flags=re.MULTILINE)
-    # Bullet points: convert lines starting with - or * to •
-    text = re.sub(r'^[\-*]\s+', '\u2022 ', text, flags=re.MULTILINE)
-    # Numbered lists: ensure numbers are followed by a period and space
-    text = re.sub(r'^(\d+)\.\s*', r'\1. ', text, flags=re.MULTILINE)
-    # Add extra line breaks before headings and between sections
-    text = re.sub(r'(\n\*.+\*)', r'\n\1', text)
-    # Remove stray hashes
-    text = re.sub(r'#+', '', text)
-    # Remove triple backticks/code blocks
-    text = re.sub(r'```[\s\S]*?```', '', text)
-    # Remove double spaces
-    text = re.sub(r'  +', ' ', text)
-    # Clean up multiple blank lines
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return text.strip()
+
+    if parse_mode:
+        call = lambda: message.edit_text(text, parse_mode=parse_mode)
+    else:
+        call = lambda: message.edit_text(text)
+    result = TELEGRAM_SCHEDULER.edit(message.chat_id, message.message_id, call, final=final, max_retries=max_retries)
+    if not final:
+        return True
+    if await result is None:
+        print(f"Failed to edit message after {max_retries} attempts")
+        return False
+    return True
+
+async def notify_backend_cancel(generation_id):
+    """Tell the backend to stop generating a reply nobody will read"""
+    try:
+        await http_client.post(CANCEL_URL, json={"generation_id": generation_id}, timeout=5)
+    except Exception as e:
+        print(f"Error cancelling backend generation: {e}")
+
+def cancel_generation(user_id):
+    """Cancel the user's running reply locally and on the backend; returns True if one was running"""
+    task = user_tasks.get(user_id)
+    generation_id = user_generations.pop(user_id, None)
+    if generation_id:
+        cancel_task = asyncio.create_task(notify_backend_cancel(generation_id))
+        background_tasks.add(cancel_task)
+        cancel_task.add_done_callback(background_tasks.discard)
+    if task and not task.done():
+        task.cancel()
+        return True
+    return False
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await safe_send_message(update, "Hello! I am your LLM-powered assistant. Ask me about government services.")
 
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    task = user_tasks.get(user_id)
-    if task and not task.done():     
-        task.cancel()
+    if cancel_generation(user_id):
         await safe_send_message(update, "Generation stopped.")
     else:
         await safe_send_message(update, "No active generation to stop.")
@@ -139,6 +123,7 @@ async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_message = update.message.text
     user_id = update.effective_user.id
+    chat_id = update.effective_chat.id
     
     # Send 'typing...' action
     async def keep_typing():
@@ -151,56 +136,70 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except Exception as e:
             print(f"Error sending chat action: {e}")
 
+    # Lets /stop or the next message cancel this reply on the backend too
+    generation_id = uuid.uuid4().hex
+
     async def stream_and_edit():
         typing_task = asyncio.create_task(keep_typing())
         try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                async with client.stream("POST", BACKEND_URL, json={"message": user_message}) as response:
-                    partial_reply = ""
-                    sent_message = await safe_send_message(update, "...")
-                    if not sent_message:
-                        print("Failed to send initial message")
-                        typing_task.cancel()
-                        return
-                    last_edit_time = time.time()
-                    edit_interval = 0.2  # seconds
-                    async for chunk in response.aiter_text():
-                        if chunk:
-                            tokens = re.findall(r'\n|\S+', chunk)
-                            for token in tokens:
-                                if token == '\n':
-                                    partial_reply += '\n'
-                                else:
-                                    if partial_reply and not partial_reply.endswith((' ', '\n')):
-                                        partial_reply += ' '
-                                    partial_reply += token
-                                # Only edit if enough time has passed
-                                if time.time() - last_edit_time > edit_interval:
-                                    await safe_edit_message(sent_message, partial_reply, parse_mode=None)
-                                    last_edit_time = time.time()
-                    # Final edit with complete response, now with Markdown formatting
-                    if partial_reply:
-                        clean_reply = sanitize_markdown(partial_reply)
-                        formatted_reply = format_for_telegram(clean_reply)
-                        await safe_edit_message(sent_message, formatted_reply, parse_mode='Markdown')
+            async with http_client.stream("POST", BACKEND_URL, json={"message": user_message, "generation_id": generation_id}) as response:
+                assembler = StreamAssembler()
+                # Long replies continue in new messages; only the last one is edited
+                chain = MessageChain(
+                    send=lambda text, parse_mode: safe_send_message(update, text, parse_mode=parse_mode),
+                    edit=lambda message, text, parse_mode, final: safe_edit_message(message, text, parse_mode=parse_mode, final=final),
+                    delete=lambda message: TELEGRAM_SCHEDULER.send(chat_id, message.delete),
+                )
+                if not await chain.start():
+                    print("Failed to send initial message")
+                    typing_task.cancel()
+                    return
+
+                cadence = EditCadence(lambda: len(user_generations))
+                async for chunk in response.aiter_text():
+                    assembler.feed(chunk)
+                    # Only edit once enough new text arrived or it got stale, and the visible text changed
+                    if cadence.due(assembler.pending_chars()):
+                        preview = assembler.snapshot()
+                        if preview:
+                            await chain.update(preview)
+                        cadence.edited()
+                # Final edits with the complete response, now formatted
+                parts = format_telegram(assembler.final())
+                if parts:
+                    await chain.finish(parts)
         except asyncio.CancelledError:
             pass
         except Exception as e:
             print(f"Error in stream_and_edit: {e}")
         finally:
             typing_task.cancel()
+            if user_generations.get(user_id) == generation_id:
+                del user_generations[user_id]
     
-    # Cancel any previous task for this user
-    prev_task = user_tasks.get(user_id)
-    if prev_task and not prev_task.done():
-        prev_task.cancel()
+    # Cancel any previous generation for this user
+    cancel_generation(user_id)
     
     # Start new task
     task = asyncio.create_task(stream_and_edit())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
     user_tasks[user_id] = task
+    user_generations[user_id] = generation_id
+
+async def post_init(application):
+    """Open the pooled backend client once the bot starts"""
+    global http_client
+    http_client = create_backend_client()
+
+async def post_shutdown(application):
+    """Close the pooled backend client and stop the send scheduler"""
+    await TELEGRAM_SCHEDULER.stop()
+    if http_client is not None:
+        await http_client.aclose()
 
 if __name__ == "__main__":
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    app = ApplicationBuilder().token(TELEGRAM_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("stop", stop))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
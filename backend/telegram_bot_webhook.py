@@ -1,13 +1,20 @@
 import os
 import asyncio
 import time
-import re
-import httpx
+import uuid
 from fastapi import FastAPI, Request, HTTPException
 from telegram import Update, Bot
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from telegram.error import RetryAfter
 from dotenv import load_dotenv
+from backend_client import create_backend_client
+from stream_assembler import StreamAssembler
+from edit_cadence import EditCadence
+from telegram_format import format_telegram
+from message_chain import MessageChain
+from telegram_scheduler import TelegramScheduler
+from update_queue import UpdateQueue
+from state_store import StateStore, MongoStateBackend
+import database
 import uvicorn
 
 load_dotenv()
@@ -16,6 +23,9 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Your Render app URL + /webhook
 BACKEND_URL = os.getenv("BACKEND_URL", "https://zenturiochatbot.onrender.com/ask")
+CANCEL_URL = BACKEND_URL.rstrip('/') + "/cancel"
+# "mongo" keeps rate limits and active generations in MongoDB so several replicas agree on them
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
 
 if not TELEGRAM_TOKEN:
     raise ValueError("TELEGRAM_TOKEN environment variable is required")
@@ -28,96 +38,90 @@ app = FastAPI()
 # Telegram application
 telegram_app = Application.builder().token(TELEGRAM_TOKEN).build()
 
+# Per-user state, bounded and expiring; STATE_BACKEND=mongo shares the last two between replicas
 # Track running tasks per user
-user_tasks = {}
-user_last_message = {}
+user_tasks = StateStore("tasks", ttl=600)
+# Track last message time per chat to implement rate limiting
+user_last_message = StateStore("last_message", ttl=60)
+# Track the backend generation id per user so /stop can cancel it server-side
+user_generations = StateStore("generations", ttl=600)
+# Keep references to fire-and-forget tasks until they finish
+background_tasks = set()
+# Pooled client for backend calls, opened on startup and closed on shutdown
+http_client = None
+# Every send and edit goes through one scheduler that enforces Telegram's rate limits
+TELEGRAM_SCHEDULER = TelegramScheduler()
 RATE_LIMIT_SECONDS = 2
 
-async def safe_send_message(bot: Bot, chat_id: int, text: str, max_retries=3):
-    """Safely send a message with retry logic and rate limiting"""
+async def safe_send_message(bot: Bot, chat_id: int, text: str, max_retries=3, parse_mode='Markdown'):
+    """Safely send a message through the shared rate-limit scheduler"""
     text = text.replace('###', '')
-    current_time = time.time()
-    
-    # Check rate limiting
+
+    # Keep at least RATE_LIMIT_SECONDS between messages to the same chat
+    await user_last_message.load(chat_id)
+    not_before = 0.0
     if chat_id in user_last_message:
-        time_since_last = current_time - user_last_message[chat_id]
-        if time_since_last < RATE_LIMIT_SECONDS:
-            await asyncio.sleep(RATE_LIMIT_SECONDS - time_since_last)
-    
-    # Try to send message with exponential backoff
-    for attempt in range(max_retries):
-        try:
-            message = await bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown')
-            user_last_message[chat_id] = time.time()
-            return message
-        except RetryAfter as e:
-            if attempt < max_retries - 1:
-                wait_time = min(e.retry_after + (attempt * 5), 120)
-                print(f"Rate limited, waiting {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
-            else:
-                print(f"Failed to send message after {max_retries} attempts")
-                return None
-        except Exception as e:
-            print(f"Error sending message: {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(1)
-            else:
-                return None
-
-async def safe_edit_message(bot: Bot, chat_id: int, message_id: int, text: str, max_retries=3, parse_mode=None):
-    """Safely edit a message with retry logic"""
+        not_before = time.monotonic() + user_last_message[chat_id] + RATE_LIMIT_SECONDS - time.time()
+
+    message = await TELEGRAM_SCHEDULER.send(
+        chat_id,
+        lambda: bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode),
+        max_retries=max_retries,
+        not_before=not_before,
+    )
+    if message is None:
+        print(f"Failed to send message after {max_retries} attempts")
+        return None
+    user_last_message[chat_id] = time.time()
+    return message
+
+async def safe_edit_message(bot: Bot, chat_id: int, message_id: int, text: str, max_retries=3, parse_mode=None, final=False):
+    """Safely edit a message through the shared rate-limit scheduler.
+
+    Intermediate edits are queued and coalesced; final edits are waited for.
+    """
     text = text.replace('###', '')
-    
-    for attempt in range(max_retries):
-        try:
-            if parse_mode:
-                await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, parse_mode=parse_mode)
-            else:
-                await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text)
-            return True
-        except RetryAfter as e:
-            if attempt < max_retries - 1:
-                wait_time = min(e.retry_after + (attempt * 5), 120)
-                print(f"Rate limited during edit, waiting {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
-            else:
-                print(f"Failed to edit message after {max_retries} attempts")
-                return False
-        except Exception as e:
-            if "Message is not modified" not in str(e):
-                print(f"Error editing message: {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(1)
-            else:
-                return False
-
-def sanitize_markdown(text):
-    text = re.sub(r'(?<!\*)\*(?!\*)', '', text)
-    text = re.sub(r'(?<!_)_(?!_)', '', text)
-    text = re.sub(r'\[([^\]]*)\]\(([^\)]*)$', r'\1 (\2)', text)
-    text = re.sub(r'`+', '', text)
-    return text
-
-def format_for_telegram(text):
-    text = re.sub(r'^#+\s*(.+)$', r'*\1*', text, flags=re.MULTILINE)
-    text = re.sub(r'^[\-*]\s+', '\u2022 ', text, flags=re.MULTILINE)
-    text = re.sub(r'^(\d+)\.\s*', r'\1. ', text, flags=re.MULTILINE)
-    text = re.sub(r'(\n\*.+\*)', r'\n\1', text)
-    text = re.sub(r'#+', '', text)
-    text = re.sub(r'```[\s\S]*?```', '', text)
-    text = re.sub(r'  +', ' ', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return text.strip()
+
+    if parse_mode:
+        call = lambda: bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, parse_mode=parse_mode)
+    else:
+        call = lambda: bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text)
+    result = TELEGRAM_SCHEDULER.edit(chat_id, message_id, call, final=final, max_retries=max_retries)
+    if not final:
+        return True
+    if await result is None:
+        print(f"Failed to edit message after {max_retries} attempts")
+        return False
+    return True
+
+async def notify_backend_cancel(generation_id):
+    """Tell the backend to stop generating a reply nobody will read"""
+    try:
+        await http_client.post(CANCEL_URL, json={"generation_id": generation_id}, timeout=5)
+    except Exception as e:
+        print(f"Error cancelling backend generation: {e}")
+
+def cancel_generation(user_id):
+    """Cancel the user's running reply locally and on the backend; returns True if one was running"""
+    task = user_tasks.get(user_id)
+    generation_id = user_generations.pop(user_id, None)
+    if generation_id:
+        cancel_task = asyncio.create_task(notify_backend_cancel(generation_id))
+        background_tasks.add(cancel_task)
+        cancel_task.add_done_callback(background_tasks.discard)
+    if task and not task.done():
+        task.cancel()
+        return True
+    return False
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await safe_send_message(context.bot, update.effective_chat.id, "Hello! I am your LLM-powered assistant. Ask me about government services.")
 
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    task = user_tasks.get(user_id)
-    if task and not task.done():     
-        task.cancel()
+    # The reply may have been started by another replica
+    await user_generations.load(user_id)
+    if cancel_generation(user_id):
         await safe_send_message(context.bot, update.effective_chat.id, "Generation stopped.")
     else:
         await safe_send_message(context.bot, update.effective_chat.id, "No active generation to stop.")
@@ -127,75 +131,80 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
     
+    # Lets /stop or the next message cancel this reply on the backend too
+    generation_id = uuid.uuid4().hex
+
     async def stream_and_edit():
         try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                async with client.stream("POST", BACKEND_URL, json={"message": user_message}) as response:
-                    partial_reply = ""
-                    sent_message = await safe_send_message(context.bot, chat_id, "...")
-                    if not sent_message:
-                        print("Failed to send initial message")
-                        return
-                    
-                    last_edit_time = time.time()
-                    edit_interval = 0.2
-                    
-                    async for chunk in response.aiter_text():
-                        if chunk:
-                            tokens = re.findall(r'\n|\S+', chunk)
-                            for token in tokens:
-                                if token == '\n':
-                                    partial_reply += '\n'
-                                else:
-                                    if partial_reply and not partial_reply.endswith((' ', '\n')):
-                                        partial_reply += ' '
-                                    partial_reply += token
-                                
-                                if time.time() - last_edit_time > edit_interval:
-                                    await safe_edit_message(context.bot, chat_id, sent_message.message_id, partial_reply)
-                                    last_edit_time = time.time()
-                    
-                    # Final edit with complete response
-                    if partial_reply:
-                        clean_reply = sanitize_markdown(partial_reply)
-                        formatted_reply = format_for_telegram(clean_reply)
-                        await safe_edit_message(context.bot, chat_id, sent_message.message_id, formatted_reply, parse_mode='Markdown')
+            async with http_client.stream("POST", BACKEND_URL, json={"message": user_message, "generation_id": generation_id}) as response:
+                assembler = StreamAssembler()
+                # Long replies continue in new messages; only the last one is edited
+                chain = MessageChain(
+                    send=lambda text, parse_mode: safe_send_message(context.bot, chat_id, text, parse_mode=parse_mode),
+                    edit=lambda message, text, parse_mode, final: safe_edit_message(
+                        context.bot, chat_id, message.message_id, text, parse_mode=parse_mode, final=final),
+                    delete=lambda message: TELEGRAM_SCHEDULER.send(
+                        chat_id, lambda: context.bot.delete_message(chat_id=chat_id, message_id=message.message_id)),
+                )
+                if not await chain.start():
+                    print("Failed to send initial message")
+                    return
+
+                cadence = EditCadence(lambda: len(user_generations))
+                async for chunk in response.aiter_text():
+                    assembler.feed(chunk)
+                    # Only edit once enough new text arrived or it got stale, and the visible text changed
+                    if cadence.due(assembler.pending_chars()):
+                        preview = assembler.snapshot()
+                        if preview:
+                            await chain.update(preview)
+                        cadence.edited()
+                # Final edits with the complete response, now formatted
+                parts = format_telegram(assembler.final())
+                if parts:
+                    await chain.finish(parts)
         except asyncio.CancelledError:
             pass
         except Exception as e:
             print(f"Error in stream_and_edit: {e}")
+        finally:
+            if user_generations.get(user_id) == generation_id:
+                del user_generations[user_id]
     
-    # Cancel any previous task for this user
-    prev_task = user_tasks.get(user_id)
-    if prev_task and not prev_task.done():
-        prev_task.cancel()
+    # Cancel any previous generation for this user
+    cancel_generation(user_id)
     
     # Start new task
     task = asyncio.create_task(stream_and_edit())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
     user_tasks[user_id] = task
+    user_generations[user_id] = generation_id
 
 # Add handlers
 telegram_app.add_handler(CommandHandler("start", start))
 telegram_app.add_handler(CommandHandler("stop", stop))
 telegram_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
+# Webhook updates are handled in background tasks so the endpoint returns immediately
+UPDATE_QUEUE = UpdateQueue(telegram_app.process_update)
+
 @app.post("/webhook")
 async def webhook(request: Request):
-    """Handle incoming webhook updates from Telegram"""
+    """Queue incoming webhook updates from Telegram and acknowledge right away"""
     try:
-        # Get the raw body
-        body = await request.body()
-        
-        # Parse the update
-        update = Update.de_json(data=await request.json(), bot=telegram_app.bot)
-        
-        # Process the update
-        await telegram_app.process_update(update)
-        
-        return {"status": "ok"}
+        data = await request.json()
+        update = Update.de_json(data=data, bot=telegram_app.bot)
     except Exception as e:
-        print(f"Error processing webhook: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Error parsing webhook: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Updates are queued per chat so each chat is handled in order.
+    # A full queue answers 503 so Telegram redelivers the update later.
+    chat = update.effective_chat
+    if not UPDATE_QUEUE.put(update.update_id, update, chat.id if chat else 0):
+        raise HTTPException(status_code=503, detail="Update queue is full")
+    return {"status": "ok"}
 
 @app.get("/")
 async def root():
@@ -203,7 +212,8 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "telegram_queue": TELEGRAM_SCHEDULER.stats(), "update_queue": UPDATE_QUEUE.stats(),
+            "state": {store.name: store.stats() for store in (user_tasks, user_last_message, user_generations)}}
 
 async def set_webhook():
     """Set the webhook URL for the bot"""
@@ -224,14 +234,28 @@ async def set_webhook():
 @app.on_event("startup")
 async def startup_event():
     """Initialize the bot and set webhook on startup"""
+    global http_client
+    http_client = create_backend_client()
+    if STATE_BACKEND == "mongo":
+        database.connect()
+        shared_state = MongoStateBackend(database.get_collection("bot_state"))
+        await shared_state.ensure_indexes()
+        user_last_message.shared = shared_state
+        user_generations.shared = shared_state
     await telegram_app.initialize()
+    UPDATE_QUEUE.start()
     await set_webhook()
     print("Telegram bot webhook server started!")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    await UPDATE_QUEUE.stop()
+    await TELEGRAM_SCHEDULER.stop()
     await telegram_app.shutdown()
+    if http_client is not None:
+        await http_client.aclose()
+    database.close()
     print("Telegram bot webhook server stopped!")
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+import html
+import re
+
+# Telegram rejects messages longer than this many UTF-16 code units
+TELEGRAM_LIMIT = 4096
+
+# Whitespace cleanup: runs of blank lines, repeated spaces
+BLANK_LINES = re.compile(r'\n{3,}')
+SPACES = re.compile(r'[ \t]{2,}')
+# Fenced code blocks, matched after the whitespace above was normalized
+FENCE = re.compile(r'^```[^\n]*(?:\n(.*?))?(?:\n```[^\n]*$|\Z)', re.S | re.M)
+# Line prefixes (heading, bullet, numbered item) and inline markup, all rewritten in one pass.
+# The leading lookahead skips positions that can't start any of them without trying each alternative.
+MARKUP = re.compile(
+    r'(?=[#*\-+•\d_`\[])(?:'
+    r'^#{1,6}[ \t]+(?P<heading>[^\n]*[^\s#])[ \t#]*$'
+    r'|^[-*+•][ \t]+(?P<bullet>)'
+    r'|^(?P<number>\d{1,3})[.)][ \t]+'
+    r'|\*\*(?P<bold>[^\n]+?)\*\*'
+    r'|__(?P<underbold>[^\n]+?)__'
+    r'|(?<![\w*])\*(?P<italic>[^\s*](?:[^*\n]*[^\s*])?)\*(?![\w*])'
+    r'|`(?P<code>[^`\n]+)`'
+    r'|\[(?P<label>[^\]\n]+)\]\((?P<url>https?://[^)\s]+)\)'
+    r'|(?P<hashes>#{2,}))',
+    re.M
+)
+
+
+def utf16_len(text):
+    """Length as Telegram counts it; emoji outside the BMP take two units"""
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _escape(text):
+    return html.escape(text, quote=False)
+
+
+def _heading(m):
+    # Headings become bold with a blank line before them
+    gap = '\n' if m.start() > 1 and m.string[m.start() - 2] != '\n' else ''
+    return f"{gap}<b>{_inline(m.group('heading'))}</b>"
+
+
+def _link(m):
+    url = m.group('url').replace('"', '&quot;')
+    return f'<a href="{url}">{_inline(m.group("label"))}</a>'
+
+
+# Keyed by the last group each MARKUP alternative closes (Match.lastgroup)
+RENDERERS = {
+    'heading': _heading,
+    'bullet': lambda m: '• ',
+    'number': lambda m: m.group('number') + '. ',
+    'bold': lambda m: f"<b>{_inline(m.group('bold'))}</b>",
+    'underbold': lambda m: f"<b>{_inline(m.group('underbold'))}</b>",
+    'italic': lambda m: f"<i>{_inline(m.group('italic'))}</i>",
+    'code': lambda m: f"<code>{m.group('code')}</code>",
+    'url': _link,
+    # Stray runs of '#' are dropped
+    'hashes': lambda m: '',
+}
+
+
+def _render_match(m):
+    return RENDERERS[m.lastgroup](m)
+
+
+def _inline(text):
+    """Render already-escaped Markdown as Telegram HTML"""
+    return MARKUP.sub(_render_match, text)
+
+
+def render_lines(markdown):
+    """Convert a Markdown reply into lines of Telegram HTML.
+
+    The reply is HTML-escaped once up front (none of the Markdown markers
+    are touched by escaping) and then all markup is rewritten in a single
+    regex pass instead of one pass per rule. Every output line is
+    self-contained, since tags never span lines, so the result can be split
+    between messages at any line.
+    """
+    text = '\n'.join(line.strip() for line in _escape(markdown.strip()).split('\n'))
+    if '\n\n\n' in text:
+        text = BLANK_LINES.sub('\n\n', text)
+    if '  ' in text or '\t' in text:
+        text = SPACES.sub(' ', text)
+    if '```' not in text:
+        return _inline(text).split('\n')
+    # Code block lines become <code> lines; the text between blocks is rendered as usual
+    parts = FENCE.split(text)
+    lines = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            lines.extend(f"<code>{line}</code>" for line in (part or '').split('\n') if line)
+        elif part.strip('\n'):
+            lines.extend(_inline(part.strip('\n')).split('\n'))
+    return lines
+
+
+def _fit(line, limit):
+    """Break a rendered line that is too long for one message at spaces in its text"""
+    if len(line) <= limit // 2 or utf16_len(line) <= limit:
+        return [line]
+    text = html.unescape(re.sub(r'<[^>]+>', '', line))
+    cut = text.rfind(' ', 0, len(text) // 2)
+    if cut <= 0:
+        cut = len(text) // 2
+    return _fit(_escape(text[:cut]), limit) + _fit(_escape(text[cut:].lstrip()), limit)
+
+
+def _paragraph_cut(lines, limit):
+    """Index of the last blank line that leaves the message at least half full, else the end"""
+    for i in range(len(lines) - 1, 0, -1):
+        if not lines[i]:
+            if sum(utf16_len(l) + 1 for l in lines[:i]) >= limit // 2:
+                return i
+            break
+    return len(lines)
+
+
+def split_lines(lines, limit=TELEGRAM_LIMIT):
+    """Pack rendered lines into messages of at most `limit` UTF-16 units.
+
+    A message is cut at the last blank line (a paragraph break) when that
+    keeps it at least half full, otherwise at the last line that fits.
+    """
+    messages = []
+    current = []
+    size = 0
+    for line in lines:
+        for piece in _fit(line, limit):
+            if not current and not piece:
+                continue
+            length = utf16_len(piece) + 1
+            if current and size + length > limit:
+                cut = _paragraph_cut(current, limit)
+                messages.append('\n'.join(current[:cut]))
+                current = current[cut:]
+                while current and not current[0]:
+                    current.pop(0)
+                size = sum(utf16_len(l) + 1 for l in current)
+                if current and size + length > limit:
+                    messages.append('\n'.join(current))
+                    current = []
+                    size = 0
+                if not current and not piece:
+                    continue
+            current.append(piece)
+            size += length
+    if current:
+        messages.append('\n'.join(current))
+    return [m.strip('\n') for m in messages if m.strip('\n')]
+
+
+def find_split(text, limit=TELEGRAM_LIMIT):
+    """Where to cut `text` so the head fits in one message.
+
+    Prefers the last paragraph break, then the last line break (which is
+    also where bullets start), then the last space, as long as the head
+    stays at least half full; otherwise cuts hard at the limit.
+    """
+    end = min(len(text), limit)
+    while utf16_len(text[:end]) > limit:
+        end -= utf16_len(text[:end]) - limit
+    for separator in ('\n\n', '\n', ' '):
+        cut = text.rfind(separator, 0, end)
+        if cut >= end // 2:
+            return cut
+    return end
+
+
+def format_telegram(markdown, limit=TELEGRAM_LIMIT):
+    """Format a Markdown reply for Telegram's HTML parse mode as a list of messages"""
+    return split_lines(render_lines(markdown), limit)
+
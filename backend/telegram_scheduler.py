@@ -0,0 +1,250 @@
+import asyncio
+import itertools
+import os
+import time
+
+from telegram.error import BadRequest, RetryAfter
+
+# Lower runs first: new messages and final edits go before intermediate edits
+SEND_PRIORITY = 0
+FINAL_EDIT_PRIORITY = 0
+EDIT_PRIORITY = 1
+
+# Telegram allows about 30 messages per second overall and about 1 per second per chat
+GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1))
+CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 3))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, now):
+        """Seconds until a token can be taken; 0 when one is available now"""
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until):
+        """Hold the bucket until the given monotonic time, e.g. after a RetryAfter"""
+        self.blocked_until = max(self.blocked_until, until)
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class _Job:
+    __slots__ = ("key", "chat_id", "call", "priority", "seq", "future", "attempts", "max_retries", "not_before")
+
+    def __init__(self, key, chat_id, call, priority, seq, max_retries):
+        self.key = key
+        self.chat_id = chat_id
+        self.call = call
+        self.priority = priority
+        self.seq = seq
+        self.future = asyncio.get_running_loop().create_future()
+        self.attempts = 0
+        self.max_retries = max_retries
+        self.not_before = 0.0
+
+
+class TelegramScheduler:
+    """Central dispatcher for Telegram sends and edits.
+
+    Every call spends a token from one global bucket and one per-chat bucket,
+    so many concurrent replies stay under Telegram's limits instead of each
+    sleeping on its own and tripping RetryAfter. Edits to the same message
+    that haven't gone out yet are coalesced: only the newest text is sent.
+    Sends and final edits are dispatched before intermediate edits.
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST):
+        self.global_bucket = TokenBucket(global_rate, max(global_rate, 1))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.queue = []
+        self.pending_edits = {}
+        self.busy_keys = set()
+        self.counter = itertools.count()
+        self.wakeup = None
+        self.dispatcher = None
+        self.last_prune = time.monotonic()
+        self.sent = 0
+        self.coalesced = 0
+        self.retry_after = 0
+        self.failed = 0
+
+    def _ensure_running(self):
+        if self.dispatcher is None or self.dispatcher.done():
+            self.wakeup = asyncio.Event()
+            self.dispatcher = asyncio.create_task(self._run())
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _push(self, job):
+        self.queue.append(job)
+        self.wakeup.set()
+
+    async def send(self, chat_id, call, max_retries=3, not_before=0.0):
+        """Run `call` (a coroutine function that sends a message) within the rate limits.
+
+        `not_before` is a time.monotonic() value the send must wait for.
+        Returns the call's result, or None once all retries failed.
+        """
+        self._ensure_running()
+        job = _Job(("send", next(self.counter)), chat_id, call, SEND_PRIORITY, next(self.counter), max_retries)
+        job.not_before = not_before
+        self._push(job)
+        return await job.future
+
+    def edit(self, chat_id, message_id, call, final=False, max_retries=3):
+        """Queue an edit of one message and return a future for its result.
+
+        If an edit of the same message is still waiting, it is replaced by
+        this one instead of both being sent.
+        """
+        self._ensure_running()
+        key = (chat_id, message_id)
+        job = self.pending_edits.get(key)
+        if job is not None:
+            job.call = call
+            self.coalesced += 1
+            if final:
+                job.priority = FINAL_EDIT_PRIORITY
+                job.max_retries = max(job.max_retries, max_retries)
+            return job.future
+        priority = FINAL_EDIT_PRIORITY if final else EDIT_PRIORITY
+        job = _Job(key, chat_id, call, priority, next(self.counter), max_retries)
+        self.pending_edits[key] = job
+        self._push(job)
+        return job.future
+
+    def _next_ready(self, now):
+        """Pick the most urgent job that may run now, or how long to wait for one"""
+        wait = None
+        global_wait = self.global_bucket.ready_in(now)
+        for job in sorted(self.queue, key=lambda j: (j.priority, j.seq)):
+            if job.key in self.busy_keys:
+                continue
+            job_wait = max(job.not_before - now, self._chat_bucket(job.chat_id).ready_in(now), global_wait)
+            if job_wait <= 0:
+                return job, None
+            wait = job_wait if wait is None else min(wait, job_wait)
+        return None, wait
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            job, wait = self._next_ready(now)
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.queue.remove(job)
+            if self.pending_edits.get(job.key) is job:
+                del self.pending_edits[job.key]
+            self.global_bucket.take(now)
+            self._chat_bucket(job.chat_id).take(now)
+            self.busy_keys.add(job.key)
+            asyncio.create_task(self._execute(job))
+            if now - self.last_prune > 60:
+                self._prune(now)
+
+    async def _execute(self, job):
+        job.attempts += 1
+        try:
+            result = await job.call()
+            self.sent += 1
+            self._resolve(job, result if result is not None else True)
+        except RetryAfter as e:
+            self.retry_after += 1
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            print(f"Rate limited by Telegram, holding chat {job.chat_id} for {retry_after} seconds...")
+            self._chat_bucket(job.chat_id).block(time.monotonic() + retry_after)
+            self._retry(job)
+        except Exception as e:
+            # Don't log "Message is not modified" errors as they're harmless
+            if "Message is not modified" in str(e):
+                self._resolve(job, True)
+            elif isinstance(e, BadRequest):
+                # Malformed text or a deleted message; sending it again won't help
+                print(f"Telegram rejected the call: {e}")
+                self.failed += 1
+                self._resolve(job, None)
+            else:
+                print(f"Error calling Telegram: {e}")
+                job.not_before = time.monotonic() + 1
+                self._retry(job)
+        finally:
+            self.busy_keys.discard(job.key)
+            self.wakeup.set()
+
+    def _retry(self, job):
+        if job.attempts >= job.max_retries:
+            print(f"Giving up on Telegram call after {job.attempts} attempts")
+            self.failed += 1
+            self._resolve(job, None)
+            return
+        newer = self.pending_edits.get(job.key)
+        if newer is not None:
+            # A newer edit of this message is already waiting; it carries the latest text
+            self._resolve(job, True)
+            return
+        if job.key[0] != "send":
+            self.pending_edits[job.key] = job
+        self._push(job)
+
+    def _resolve(self, job, result):
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _prune(self, now):
+        """Forget chats whose buckets are full again"""
+        self.last_prune = now
+        active = {job.chat_id for job in self.queue}
+        for chat_id in [c for c, b in self.chat_buckets.items() if c not in active and b.is_idle(now)]:
+            del self.chat_buckets[chat_id]
+
+    async def stop(self):
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            await asyncio.gather(self.dispatcher, return_exceptions=True)
+            self.dispatcher = None
+
+    def stats(self):
+        return {
+            "queued": len(self.queue),
+            "pending_edits": len(self.pending_edits),
+            "in_flight": len(self.busy_keys),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "retry_after": self.retry_after,
+            "failed": self.failed,
+            "tracked_chats": len(self.chat_buckets),
+        }
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Check how many message edits EditCadence asks for while a reply streams,
+replayed on a simulated clock.
+
+Needs no network. Run from the backend directory (exits non-zero on
+failure):
+
+    python test_edit_cadence.py
+"""
+
+import sys
+
+from edit_cadence import EditCadence
+from stream_assembler import StreamAssembler
+
+# A ~1500 character reply streamed as 4 character chunks over 12 seconds
+REPLY = ("To apply for a birth certificate, visit the Ksmart portal and upload the hospital "
+         "discharge summary along with the parents' Aadhaar. ") * 12
+CHUNKS = [REPLY[i:i + 4] for i in range(0, len(REPLY), 4)]
+SECONDS = 12.0
+
+
+def replay(cadence, chunks=CHUNKS, seconds=SECONDS):
+    """Stream the chunks evenly over `seconds`; returns the times of the edits the cadence asked for"""
+    assembler = StreamAssembler()
+    cadence.last_edit = 0.0
+    edits = []
+    for i, chunk in enumerate(chunks):
+        now = (i + 1) * seconds / len(chunks)
+        assembler.feed(chunk)
+        if cadence.due(assembler.pending_chars(), now):
+            if assembler.snapshot():
+                edits.append(now)
+            cadence.edited(now)
+    return edits
+
+
+def test_cadence():
+    failures = []
+    # 1500 chars at 200 per edit, never closer than 1 s: about one edit a second, not one per 0.2 s
+    edits = replay(EditCadence(min_chars=200, min_interval=1.0, max_staleness=2.5, busy_generations=20))
+    if not 6 <= len(edits) <= 9:
+        failures.append(f"idle bot: expected 6-9 edits over {SECONDS:.0f} s, got {len(edits)}")
+    gaps = [later - earlier for earlier, later in zip([0.0] + edits, edits)]
+    if gaps and min(gaps) < 1.0:
+        failures.append(f"idle bot: edits {min(gaps):.2f} s apart, under the 1 s minimum")
+    # A trickle of text below min_chars is still shown once it has waited max_staleness
+    edits = replay(EditCadence(min_chars=10000, min_interval=1.0, max_staleness=2.5))
+    if len(edits) != int(SECONDS // 2.5):
+        failures.append(f"slow stream: expected an edit every 2.5 s, got {len(edits)} edits")
+    # With 80 replies streaming (4x busy_generations) every threshold is 4x longer
+    busy = replay(EditCadence(lambda: 80, min_chars=200, min_interval=1.0, max_staleness=2.5, busy_generations=20))
+    if not 1 <= len(busy) <= 3:
+        failures.append(f"busy bot: expected 1-3 edits, got {len(busy)}")
+    # Load beyond MAX_BACKOFF stops stretching the thresholds
+    cadence = EditCadence(lambda: 10 ** 6, busy_generations=20)
+    if cadence.backoff() != 8.0:
+        failures.append(f"backoff under extreme load is {cadence.backoff()}, expected the 8.0 cap")
+    if EditCadence().due(0, now=10 ** 6):
+        failures.append("an edit was due with no new text")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    ok = test_cadence()
+    if ok:
+        print("✅ edit counts follow min_chars, min_interval, max_staleness and the load backoff")
+    sys.exit(0 if ok else 1)
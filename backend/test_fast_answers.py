@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Check which questions FastAnswerer answers from the catalog and which go to
+the LLM.
+
+Each question is resolved the way /ask does it (QueryNormalizer and catalog
+search). Uses the real gov_services.csv and needs no network. Run from the
+backend directory (exits non-zero on failure):
+
+    python test_fast_answers.py
+"""
+
+import sys
+
+from catalog_loader import load_catalog
+from fast_answers import FastAnswerer
+
+# Question -> service whose section the fast reply must show, or None when the LLM has to answer
+EXPECTED = {
+    "fees for duplicate driving license": "Duplicate Driving License",
+    "documents needed for ration card": "Ration Card Application",
+    "birth certificate fees": "Birth Certificate Application",
+    "aadhaar enrolment documents": "Aadhaar Enrolment",
+    "how long does driving license renewal take": "Driving License Renewal",
+    "contact number for sanchaya property tax": "Sanchaya Property Tax",
+    "ration kardinu fees ethra": "Ration Card Application",
+    "what is the fee for learner license": "Learner’s License Application",
+    # The LLM answers these
+    "how to renew driving license": None,
+    "റേഷൻ കാർഡിന് ഫീസ് എത്ര": None,
+    "why is the birth certificate fee so high": None,
+    "fees and documents for ration card": None,
+    "how do i get a passport": None,
+}
+
+
+def test_fast_answers():
+    catalog = load_catalog([], [], snapshot_path=None)
+    rows = {row["service_name"]: row for row in catalog.rows}
+    answerer = FastAnswerer()
+    failures = []
+    for question, expected in EXPECTED.items():
+        query = catalog.normalizer.normalize(question)
+        reply = answerer.answer(query, catalog.services.search(query, limit=3), question)
+        if expected is None and reply is not None:
+            failures.append(f"{question!r} was answered from the catalog:\n{reply}")
+        elif expected is not None and (reply is None or f"## {expected}\n" not in reply):
+            failures.append(f"{question!r}: expected a section for {expected!r}, got {reply!r}")
+    # Even when search scores a service at 100, a question that leaves out part of its name
+    # ("new driving license" inside "renew driving license") must not get that service's answer
+    new_license = [(rows["Apply for New Driving License"], 100.0)]
+    for query in ("how to renew driving license", "driving license fees"):
+        reply = answerer.answer(query, new_license)
+        if reply is not None:
+            failures.append(f"{query!r} answered with the new license row:\n{reply}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(answerer.stats())
+    return not failures
+
+
+if __name__ == "__main__":
+    ok = test_fast_answers()
+    if ok:
+        print(f"✅ {len(EXPECTED) + 2} questions took the expected path")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Check that IntentClassifier tells government service questions from
+greetings and off-topic messages.
+
+Uses the real gov_services.csv with the keyword lists from main.py and needs
+no network. Run from the backend directory (exits non-zero on failure):
+
+    python test_intent_classifier.py
+"""
+
+import sys
+
+from catalog_loader import load_catalog
+from main import GOV_KEYWORDS, GREETINGS
+
+# Message -> intent
+EXPECTED = {
+    # Service names, with or without their parenthesised alias and punctuation
+    "voter registration": "gov",
+    "how do I do voter registration?": "gov",
+    "Voter Registration (EPIC)": "gov",
+    "international driving permit": "gov",
+    "I need a learner's license": "gov",
+    "learners license fees": "gov",
+    "d&o license": "gov",
+    "e-aadhaar download": "gov",
+    # Other forms of a keyword
+    "pensioner help desk": "gov",
+    "I am a licensed driver": "gov",
+    "pay my electricity bills": "gov",
+    "hello": "greeting",
+    "Hi, good morning": "greeting",
+    # Keywords inside other words don't count
+    "a billion dollars": "off_topic",
+    "what is football": "off_topic",
+}
+
+
+def test_classify():
+    catalog = load_catalog(GREETINGS, GOV_KEYWORDS, snapshot_path=None)
+    failures = []
+    for message, expected in EXPECTED.items():
+        match = catalog.intents.classify(message)
+        if match.intent != expected:
+            failures.append(f"{message!r}: expected {expected}, got {match.intent} ({match.keywords})")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    ok = test_classify()
+    if ok:
+        print(f"✅ {len(EXPECTED)} messages got the expected intent")
+    sys.exit(0 if ok else 1)
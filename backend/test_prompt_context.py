@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Check which facets detect_facets finds in normalized questions, which
+decides the catalog columns the prompt and the fast path show.
+
+Needs no network. Run from the backend directory (exits non-zero on
+failure):
+
+    python test_prompt_context.py
+"""
+
+import sys
+
+from prompt_context import detect_facets
+
+# Normalized question -> facets
+EXPECTED = {
+    "ration card fees": ["fees"],
+    "how much to pay for ration card": ["fees"],
+    "is it free": ["fees"],
+    "documents needed for birth certificate": ["documents"],
+    "driving license renewal processing time": ["processing_time"],
+    "how much time does it take": ["processing_time"],
+    "how to apply for ration card": ["how_to_apply"],
+    "phone number of kseb office": ["contact"],
+    "toll free number for voter registration": ["contact"],
+    "fees and documents for ration card": ["fees", "documents"],
+    # Generic words that are part of a name or a question, not a facet
+    "survey number": [],
+    "change of address in dl": [],
+    "kseb electricity bill payment": [],
+    "first time voter registration": [],
+}
+
+
+def test_facets():
+    failures = []
+    for question, expected in EXPECTED.items():
+        facets = detect_facets(question)
+        if facets != expected:
+            failures.append(f"{question!r}: expected {expected}, got {facets}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    ok = test_facets()
+    if ok:
+        print(f"✅ {len(EXPECTED)} questions got the expected facets")
+    sys.exit(0 if ok else 1)
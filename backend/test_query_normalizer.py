@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Check that QueryNormalizer rewrites Malayalam, Manglish, spelling variants
+and CSV aliases into catalog English, and that the rewritten questions find
+the right service.
+
+Uses the real gov_services.csv and needs no network. Run from the backend
+directory (exits non-zero on failure):
+
+    python test_query_normalizer.py
+"""
+
+import sys
+
+from catalog_loader import load_catalog
+from query_normalizer import QueryNormalizer
+
+# Question -> normalized question
+NORMALIZED = {
+    # Spelling variants and abbreviations
+    "Driving Licence renew": "driving license renew",
+    "renew my DL": "renew my driving license",
+    "handle this": "handle this",
+    "current bill adakkan": "electricity bill payment",
+    # Manglish with case endings
+    "janana certificate engane apekshikkam": "birth certificate how to apply",
+    "ration kardinu fees": "ration card fees",
+    "vivaha certificate download": "marriage certificate download",
+    # Malayalam, inflected forms and old-style chillus
+    "റേഷൻ കാർഡ്": "ration card",
+    "റേഷൻ കാർഡിന് എങ്ങനെ അപേക്ഷിക്കാം": "ration card how to apply",
+    "ജനന സർട്ടിഫിക്കറ്റിന് രേഖകൾ": "birth certificate documents",
+    "മരണ സര്‍ട്ടിഫിക്കറ്റ് ഫീസ്": "death certificate fee",
+    "നമസ്കാരം": "hello",
+    # Parenthesised parts of service names
+    "IDP ethra divasam": "international driving permit how long",
+    "epic card": "voter registration card",
+    "kerala water authority bill": "water bill payment bill",
+}
+# Question -> service the normalized question must resolve to
+RESOLVED = {
+    "renew my DL": "Driving License Renewal",
+    "dl extract": "DL Extract",
+    "change of address in dl": "Change of Address in DL",
+    "duplicate dl fees": "Duplicate Driving License",
+    "റേഷൻ കാർഡിന് എങ്ങനെ അപേക്ഷിക്കാം": "Ration Card Application",
+    "IDP ethra divasam": "International Driving Permit (IDP)",
+}
+
+
+def test_normalize():
+    catalog = load_catalog([], [], snapshot_path=None)
+    failures = []
+    for question, expected in NORMALIZED.items():
+        normalized = catalog.normalizer.normalize(question)
+        if normalized != expected:
+            failures.append(f"{question!r} -> {normalized!r}, expected {expected!r}")
+    for question, expected in RESOLVED.items():
+        row = catalog.services.find(catalog.normalizer.normalize(question))
+        found = row["service_name"] if row else None
+        if found != expected:
+            failures.append(f"{question!r} resolved to {found!r}, expected {expected!r}")
+    # An `aliases` column adds its own alternative names
+    normalizer = QueryNormalizer([{"service_name": "Voter Registration (EPIC)", "aliases": "form 6|new voter id"}])
+    if normalizer.normalize("form 6 status") != "voter registration status":
+        failures.append(f"aliases column: 'form 6 status' -> {normalizer.normalize('form 6 status')!r}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    ok = test_normalize()
+    if ok:
+        print(f"✅ {len(NORMALIZED)} normalizations and {len(RESOLVED)} resolved services as expected")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Check SemanticCache at DEFAULT_THRESHOLD on questions that should and
+shouldn't share an answer.
+
+Each question is resolved the way /ask does it (QueryNormalizer, catalog
+search, detect_facets); the first one of a pair is cached and the second is
+looked up. Uses the real gov_services.csv and needs no network. Run from the
+backend directory (exits non-zero on failure):
+
+    python test_semantic_cache.py
+"""
+
+import sys
+
+from catalog_loader import load_catalog
+from prompt_context import detect_facets
+from semantic_cache import DEFAULT_THRESHOLD, HashingVectorizer, SemanticCache
+
+# Pairs that should get the same answer
+PARAPHRASES = [
+    ("renew my DL", "driving licence renewal process"),
+    ("renew my driving licence", "driving licence renewal process"),
+    ("how do i renew my driving license", "renew driving licence"),
+    ("how to apply for ration card", "how can i apply for a ration card"),
+    ("birth certificate fees", "what are the fees for birth certificate"),
+    ("ration card fees", "what is the fee for ration card"),
+    ("documents needed for ration card", "what documents are required for ration card"),
+    ("how long does driving license renewal take", "driving license renewal processing time"),
+    ("kseb electricity bill payment contact number", "helpline number for kseb electricity bill payment"),
+    ("how to download birth certificate", "birth certificate download how to"),
+    ("aadhaar enrolment documents", "documents for aadhaar enrolment"),
+    ("duplicate driving licence fees", "fee for duplicate driving license"),
+]
+# Pairs about the same service whose answers differ
+DIFFERENT = [
+    ("how to apply for birth certificate online", "how to apply for birth certificate for a child born abroad"),
+    ("birth certificate fees", "late fees for birth certificate after one year"),
+    ("birth certificate fees", "documents for birth certificate"),
+    ("how to apply for ration card", "how to apply for ration card if my name is in another card"),
+    ("documents for ration card", "documents for ration card for a migrant worker"),
+    ("voter id correction how to apply", "how to apply voter id correction without aadhaar"),
+    ("driving license renewal fees", "driving license renewal fees after expiry of 5 years"),
+    ("how to pay property tax in sanchaya", "how to pay property tax in sanchaya for a shop"),
+    ("death certificate how to apply", "death certificate how to apply if death happened in another state"),
+]
+
+
+def test_semantic_cache():
+    catalog = load_catalog([], [], snapshot_path=None)
+    vectorizer = HashingVectorizer().fit(f"{row['service_name']} {row['description']}" for row in catalog.rows)
+
+    def resolve(question):
+        query = catalog.normalizer.normalize(question)
+        row = catalog.services.find(query)
+        return query, row["service_name"] if row else "", detect_facets(query)
+
+    failures = []
+    for expected_hit, pairs in ((True, PARAPHRASES), (False, DIFFERENT)):
+        for first, second in pairs:
+            cache = SemanticCache(vectorizer, capacity=4, threshold=DEFAULT_THRESHOLD)
+            query, service_name, facets = resolve(first)
+            cache.add(query, service_name, "cached reply", facets)
+            hit = cache.lookup(*resolve(second)) is not None
+            if hit != expected_hit:
+                failures.append(f"{first!r} / {second!r}: expected {'a hit' if expected_hit else 'a miss'}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    ok = test_semantic_cache()
+    if ok:
+        print(f"✅ {len(PARAPHRASES)} paraphrases hit and {len(DIFFERENT)} different questions missed "
+              f"at threshold {DEFAULT_THRESHOLD}")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Check which service ServiceCatalog.search resolves questions to.
+
+Uses the real gov_services.csv and needs no network. Run from the backend
+directory (exits non-zero on failure):
+
+    python test_service_catalog.py
+"""
+
+import sys
+
+from catalog_loader import load_catalog
+
+# Normalized question -> service that must come first (None: nothing may match)
+EXPECTED = {
+    # A name found inside another word ("new" in "renew") is not a match
+    "renew driving license": "Driving License Renewal",
+    "how to renew driving license": "Driving License Renewal",
+    "renew my driving license": "Driving License Renewal",
+    "how do i renew my driving license": "Driving License Renewal",
+    "what documents are needed to renew my driving license": "Driving License Renewal",
+    "new driving license": "Apply for New Driving License",
+    "driving license renewal": "Driving License Renewal",
+    "change of address in dl": "Change of Address in DL",
+    "kseb bill payment": "KSEB Electricity Bill Payment",
+    "property tax payment sanchaya": "Sanchaya Property Tax",
+    # Typos and partial names still match
+    "birth certifcate fees": "Birth Certificate Application",
+    "rationcard": "Ration Card Application",
+    "idp": "International Driving Permit (IDP)",
+    "international driving permit how long": "International Driving Permit (IDP)",
+    "aadhar enrolment": "Aadhaar Enrolment",
+    "what is football": None,
+}
+
+
+def test_search():
+    catalog = load_catalog([], [], snapshot_path=None)
+    failures = []
+    for question, expected in EXPECTED.items():
+        matches = catalog.services.search(question, limit=1)
+        found = matches[0][0]["service_name"] if matches else None
+        if found != expected:
+            failures.append(f"{question!r}: expected {expected!r}, got {found!r}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    ok = test_search()
+    if ok:
+        print(f"✅ {len(EXPECTED)} questions resolved to the expected service")
+    sys.exit(0 if ok else 1)
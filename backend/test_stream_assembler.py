@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Check that StreamAssembler rebuilds streamed replies exactly and only hands
+out previews that end on a whole word, and time it on a long reply.
+
+Needs no network. Run from the backend directory (exits non-zero on
+failure):
+
+    python test_stream_assembler.py
+"""
+
+import sys
+import time
+
+from stream_assembler import StreamAssembler
+
+# A ~4k character reply streamed in 7 character chunks
+WORDS = ("Apply online through the Ksmart portal with your **Aadhaar** and hospital birth proof. "
+         "- Fees: ₹0 within 21 days\n")
+REPLY = WORDS * (4096 // len(WORDS) + 1)
+CHUNKS = [REPLY[i:i + 7] for i in range(0, len(REPLY), 7)]
+
+
+def assemble(chunks, edit_every=5):
+    """Feed the chunks, taking a snapshot every `edit_every`; returns the final text and the previews"""
+    assembler = StreamAssembler()
+    previews = []
+    for i, chunk in enumerate(chunks):
+        assembler.feed(chunk)
+        if i % edit_every == 0:
+            preview = assembler.snapshot()
+            if preview:
+                previews.append(preview)
+    return assembler.final(), previews
+
+
+def test_assembler():
+    failures = []
+    text, previews = assemble(CHUNKS)
+    if text != REPLY.strip():
+        failures.append("the final text differs from the streamed reply")
+    for preview in previews:
+        if not REPLY.startswith(preview) or REPLY[len(preview)] not in " \n":
+            failures.append(f"preview ends inside a word: ...{preview[-30:]!r}")
+            break
+    if len(previews) != len(set(previews)):
+        failures.append("the same preview was handed out twice")
+    # A word split across chunks is not glued or spaced apart
+    text, _ = assemble(["Ksm", "art por", "tal\n\n", "  done "])
+    if text != "Ksmart portal\n\n  done":
+        failures.append(f"split words came out as {text!r}")
+    # No new text since the last snapshot means nothing to edit
+    assembler = StreamAssembler()
+    assembler.feed("hello world ")
+    assembler.snapshot()
+    if assembler.pending_chars() != 0 or assembler.snapshot() is not None:
+        failures.append("an unchanged preview was handed out again")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return not failures
+
+
+def benchmark(runs=20):
+    start = time.perf_counter()
+    for _ in range(runs):
+        assemble(CHUNKS)
+    print(f"StreamAssembler: {(time.perf_counter() - start) / runs * 1000:.2f} ms for a "
+          f"{len(REPLY)} char reply in {len(CHUNKS)} chunks")
+
+
+if __name__ == "__main__":
+    ok = test_assembler()
+    if ok:
+        print("✅ streamed replies reassembled exactly, previews end on whole words")
+    benchmark()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Check that format_telegram turns Markdown replies into HTML Telegram
+accepts, within the message limit, and time it on a long reply.
+
+Needs no network. Run from the backend directory (exits non-zero on
+failure):
+
+    python test_telegram_format.py
+"""
+
+import random
+import re
+import sys
+import time
+from html.parser import HTMLParser
+
+from telegram_format import TELEGRAM_LIMIT, format_telegram, utf16_len
+
+SAMPLE = ("## Birth Certificate\n\nApply on the **Ksmart** portal with *hospital proof*.\n"
+          "- Fees: ₹0 within 21 days & ₹10 after <30 days>\n1) Upload `Form 2`\n"
+          "See [the portal](https://ksmart.lsgkerala.gov.in) for details.\n\n") * 40
+# Pieces the fuzz check builds random replies from
+ALPHABET = ['*', '**', '_', '__', '`', '```', '[', ']', '(', ')', 'https://x.io', '#', '## ', '- ', '1. ',
+            '<', '>', '&', '"', ' ', '  ', '\n', '\n\n', 'word', 'ആധാർ', '😀']
+FUZZ_CASES = 5000
+BAD_ENTITY = re.compile(r'&(?!(?:amp|lt|gt|quot|#x27);)')
+
+
+class TagChecker(HTMLParser):
+    """Collects anything Telegram's HTML parser would reject"""
+
+    ALLOWED = {'b', 'i', 'code', 'a'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack = []
+        self.problems = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in self.ALLOWED:
+            self.problems.append(f"unsupported tag <{tag}>")
+        self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack.pop() != tag:
+            self.problems.append(f"unbalanced </{tag}>")
+
+
+def problems(message, limit):
+    """Reasons Telegram would reject the message, empty when it is fine"""
+    found = []
+    if utf16_len(message) > limit:
+        found.append(f"{utf16_len(message)} units over the limit of {limit}")
+    if BAD_ENTITY.search(message):
+        found.append("unescaped &")
+    checker = TagChecker()
+    checker.feed(message)
+    checker.close()
+    found.extend(checker.problems)
+    if checker.stack:
+        found.append(f"unclosed tags {checker.stack}")
+    return found
+
+
+def test_format():
+    failures = []
+    messages = format_telegram(SAMPLE)
+    if len(messages) < 2:
+        failures.append(f"a {len(SAMPLE)} char reply was not split: {len(messages)} message")
+    if "<b>Birth Certificate</b>" not in messages[0] or "&lt;30 days&gt;" not in messages[0]:
+        failures.append(f"headings or escaping are missing from:\n{messages[0][:300]}")
+    # Random Markdown-ish text must always give valid HTML within the limit
+    rng = random.Random(0)
+    for _ in range(FUZZ_CASES):
+        text = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 400)))
+        limit = rng.choice([64, 256, TELEGRAM_LIMIT])
+        for message in format_telegram(text, limit):
+            found = problems(message, limit)
+            if found:
+                failures.append(f"{text!r} at limit {limit}: {', '.join(found)} in {message!r}")
+                break
+    for failure in failures[:10]:
+        print(f"❌ {failure}")
+    return not failures
+
+
+def benchmark(runs=50):
+    start = time.perf_counter()
+    for _ in range(runs):
+        format_telegram(SAMPLE)
+    print(f"format_telegram: {(time.perf_counter() - start) / runs * 1000:.2f} ms for a {len(SAMPLE)} char reply")
+
+
+if __name__ == "__main__":
+    ok = test_format()
+    if ok:
+        print(f"✅ {FUZZ_CASES} random replies formatted into valid Telegram HTML")
+    benchmark()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,105 @@
+import asyncio
+import os
+from collections import OrderedDict, deque
+
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 32))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+# How many recent update_ids to remember for spotting redeliveries
+UPDATE_DEDUP_SIZE = 10000
+
+
+class UpdateQueue:
+    """Bounded queue between the webhook endpoint and the update handlers.
+
+    The webhook only enqueues and returns, so Telegram gets its 200 right
+    away and doesn't redeliver while a slow handler runs. Each key (the chat
+    id) has its own queue, drained by a task that exists only while the chat
+    has updates waiting, so updates from one chat are handled one at a time
+    and in order, as PTB does without the queue; a "/stop" is never
+    overtaken by the message sent right after it. A chat waiting on a slow
+    handler (a rate-limited send) holds up only itself. At most `workers`
+    updates are processed at once across all chats. An update_id that was
+    already accepted is ignored, and when `maxsize` updates are waiting
+    `put()` returns False so the webhook can answer with an error and let
+    Telegram deliver it again later.
+    """
+
+    def __init__(self, process, workers=UPDATE_WORKERS, maxsize=UPDATE_QUEUE_SIZE, dedup_size=UPDATE_DEDUP_SIZE):
+        self.process = process
+        self.worker_count = workers
+        self.maxsize = maxsize
+        self.dedup_size = dedup_size
+        self.slots = None
+        self.chats = {}
+        self.tasks = {}
+        self.queued = 0
+        self.seen = OrderedDict()
+        self.accepted = 0
+        self.processed = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def start(self):
+        self.slots = asyncio.Semaphore(self.worker_count)
+
+    def put(self, update_id, update, key=0):
+        """Queue an update behind the others for `key`; returns False when it must be retried later"""
+        if update_id in self.seen:
+            self.duplicates += 1
+            return True
+        if self.slots is None or self.queued >= self.maxsize:
+            self.rejected += 1
+            return False
+        self.chats.setdefault(key, deque()).append(update)
+        self.queued += 1
+        if key not in self.tasks:
+            self.tasks[key] = asyncio.create_task(self._drain(key))
+        self.seen[update_id] = True
+        if len(self.seen) > self.dedup_size:
+            self.seen.popitem(last=False)
+        self.accepted += 1
+        return True
+
+    async def _drain(self, key):
+        updates = self.chats[key]
+        try:
+            while updates:
+                async with self.slots:
+                    update = updates.popleft()
+                    self.queued -= 1
+                    try:
+                        await self.process(update)
+                        self.processed += 1
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"Error processing update: {e}")
+        finally:
+            self.queued -= len(updates)
+            del self.chats[key]
+            del self.tasks[key]
+
+    async def stop(self, drain_timeout=5.0):
+        """Give queued updates a moment to finish, then cancel what is left"""
+        tasks = list(self.tasks.values())
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=drain_timeout)
+            if pending:
+                print(f"Dropping {self.queued} queued updates on shutdown")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self.slots = None
+
+    def stats(self):
+        return {
+            "depth": self.queued,
+            "maxsize": self.maxsize,
+            "workers": self.worker_count,
+            "active_chats": len(self.tasks),
+            "accepted": self.accepted,
+            "processed": self.processed,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
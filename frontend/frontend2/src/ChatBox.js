@@ -61,43 +61,76 @@ export default function ChatBox() {
     setMessages(prev => [...prev, userMsg]);
     setIsTyping(true);
 
-    const res = await axios.post(
-      "https://zenturiochatbot.onrender.com/ask",
-      { message: input },
-      { headers: { 'X-Frontend': 'web' } }
-    );
-    const botText = res.data.reply;
-    const lines = botText.split(/\r?\n/).filter(line => line.trim() !== "");
-    let currentText = "";
-    let lineIdx = 0;
-    const showNextLine = () => {
-      if (lineIdx < lines.length) {
-        currentText += (currentText ? "\n" : "") + lines[lineIdx];
-        setMessages(prev => {
-          // Remove the last bot message if it's still being built
-          const last = prev[prev.length - 1];
-          if (last && last.sender === "Bot" && last.incomplete) {
-            return [...prev.slice(0, -1), { sender: "Bot", text: currentText, incomplete: true }];
-          } else {
-            return [...prev, { sender: "Bot", text: currentText, incomplete: true }];
+    setInput("");
+
+    // Show the reply as it streams in, replacing the bot message that is still being built
+    const showBotText = (text, incomplete) => {
+      setMessages(prev => {
+        const last = prev[prev.length - 1];
+        const botMsg = incomplete ? { sender: "Bot", text, incomplete: true } : { sender: "Bot", text };
+        if (last && last.sender === "Bot" && last.incomplete) {
+          return [...prev.slice(0, -1), botMsg];
+        }
+        return [...prev, botMsg];
+      });
+    };
+
+    let botText = "";
+    try {
+      const res = await fetch("https://zenturiochatbot.onrender.com/ask", {
+        method: "POST",
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Frontend': 'web',
+          'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify({ message: userMsg.text }),
+      });
+      // Errors (and proxies that drop the Accept header) come back as plain JSON or text, not a stream
+      const contentType = res.headers.get("content-type") || "";
+      if (!res.ok || !contentType.includes("text/event-stream") || !res.body) {
+        const errorText = await res.text();
+        let reply = errorText;
+        try {
+          const data = JSON.parse(errorText);
+          reply = data.reply || data.detail || data.message || errorText;
+        } catch (parseErr) {
+          // Not JSON; show the text as it is
+        }
+        botText = (typeof reply === "string" && reply.trim()) ? reply : `The server returned an error (${res.status}).`;
+        showBotText(botText, false);
+        setIsTyping(false);
+        return;
+      }
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        // Server-Sent Events are separated by a blank line
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const rawEvent of events) {
+          let eventName = "message";
+          let data = "";
+          for (const line of rawEvent.split("\n")) {
+            if (line.startsWith("event:")) eventName = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
           }
-        });
-        lineIdx++;
-        setTimeout(showNextLine, 150); // 150ms per line (was 400ms)
-      } else {
-        // Mark the last bot message as complete
-        setMessages(prev => {
-          const last = prev[prev.length - 1];
-          if (last && last.sender === "Bot" && last.incomplete) {
-            return [...prev.slice(0, -1), { sender: "Bot", text: currentText }];
+          if (eventName === "chunk" && data) {
+            botText += JSON.parse(data).text;
+            showBotText(botText, true);
           }
-          return prev;
-        });
-        setIsTyping(false);
+        }
       }
-    };
-    showNextLine();
-    setInput("");
+    } catch (err) {
+      if (!botText) botText = "Something went wrong while talking to the server.";
+    }
+    // Mark the bot message as complete
+    showBotText(botText, false);
+    setIsTyping(false);
   };
 
   useEffect(() => {